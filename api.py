@@ -0,0 +1,76 @@
+"""
+skin2momentum
+api - in-process conversions: config in, structured result out, progress as events (no stdout)
+
+    from api import ConvertConfig, convert
+    result = convert(ConvertConfig(data, game, output, weapon, gloves, 'knife'), on_event=print)
+"""
+
+import time
+from collections import namedtuple
+from events import listening, get_logger
+
+logger = get_logger('api')
+
+# Same names and defaults as the skin2momentum.py options
+CONFIG_DEFAULTS = {
+    'crowbar': None,
+    'studiomdl': None,
+    'work': None,
+    'store': None,
+    'cache_dir': None,
+    'cache_size': None,
+    'no_cache': False,
+    'force': False,
+    'trace': None,
+    'vpk': None,
+    'vpk_version': 1,
+    'max_texture_size': None,
+    'no_textures': False,
+    'compile_dir': None,
+    'compile_workers': None,
+    'compile_timeout': None,
+    'fit_bbox': False,
+    'prune_bones': False,
+    'lods': None,
+    'lod_switch': None,
+}
+ConvertConfig = namedtuple('ConvertConfig', ['data', 'game', 'output', 'weapon', 'gloves', 'type', *CONFIG_DEFAULTS],
+                           defaults=list(CONFIG_DEFAULTS.values()))
+
+# model: compiled .mdl (None if the config was rejected)
+# artifacts: runtime files (model, scripts, VMTs, VTFs) and the VPK
+# timings: per-stage metrics, diagnostics: matched Crowbar/studiomdl errors and warnings per step
+ConvertResult = namedtuple('ConvertResult', 'success model artifacts timings diagnostics materials staging error duration')
+
+def convert(config, on_event=None):
+    """Run one conversion in this process. on_event(Event) gets log lines and stage start/finish
+    (called from worker threads too). Bad configs and stage errors give success=False with error, they do not raise."""
+    # The converter pulls in asyncio and every stage module
+    from skin2momentum import Converter
+
+    start = time.perf_counter()
+    with listening(on_event):
+        try:
+            converter = Converter(config)
+        except (ValueError, OSError) as e:
+            return ConvertResult(False, None, [], {}, {}, [], {}, str(e), round(time.perf_counter() - start, 3))
+        error = None
+        try:
+            success = converter.main()
+        except Exception as e:
+            # Whatever the stages recorded before the failure is still returned
+            logger.error(f"[api] Conversion failed: {e}")
+            success, error = False, f"{type(e).__name__}: {e}"
+
+    return ConvertResult(
+        success=success,
+        model=converter.output_dir / f"{converter.model_name}.mdl",
+        artifacts=converter.artifacts(),
+        timings=converter.tracer.totals(),
+        diagnostics=converter.diagnostics,
+        materials=converter.materials,
+        staging=converter.stager.stats(),
+        error=error or (None if success else "Conversion failed (see diagnostics and the log events)"),
+        duration=round(time.perf_counter() - start, 3),
+    )
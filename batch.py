@@ -0,0 +1,309 @@
+"""
+skin2momentum
+batch - runs many weapon x glove conversions across a process pool
+"""
+
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import traceback
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from skin2momentum import Converter, add_cache_args, add_texture_args, add_compile_args, add_geometry_args, add_lod_args
+from vmt_fixer import directory_cache
+from instrumentation import write_trace
+from events import log_to_console
+from content_store import ContentStore
+from catalog import Catalog
+
+def load_manifest(manifest_path):
+    """Read job manifest (list of {weapon, gloves, type[, name]})"""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('jobs', [])
+
+    jobs = []
+    names = set()
+    for i, entry in enumerate(data):
+        for key in ('weapon', 'gloves', 'type'):
+            if not entry.get(key):
+                raise ValueError(f"[batch] Job {i} is missing '{key}'")
+        if entry['type'] not in ('knife', 'pistol'):
+            raise ValueError(f"[batch] Job {i} has type {entry['type']}. Must be 'knife' or 'pistol'")
+
+        # Job names become output dirs, keep them unique
+        name = entry.get('name') or f"{_stem(entry['weapon'])}__{_stem(entry['gloves'])}"
+        unique_name = name
+        suffix = 2
+        while unique_name in names:
+            unique_name = f"{name}_{suffix}"
+            suffix += 1
+        names.add(unique_name)
+
+        jobs.append({
+            'name': unique_name,
+            'weapon': entry['weapon'],
+            'gloves': entry['gloves'],
+            'type': entry['type'],
+        })
+    return jobs
+
+def _stem(model_path):
+    return Path(model_path.replace('\\', '/')).stem
+
+def job_args(settings, job):
+    """Converter args for one job"""
+    job_root = Path(settings['output']) / job['name']
+    return argparse.Namespace(
+        data=settings['data'],
+        game=settings['game'],
+        output=str(job_root),
+        weapon=job['weapon'],
+        gloves=job['gloves'],
+        type=job['type'],
+        crowbar=settings.get('crowbar'),
+        studiomdl=settings.get('studiomdl'),
+        work=str(job_root / "work"),
+        store=str(Path(settings['output']) / "_store"),
+        cache_dir=settings.get('cache_dir'),
+        cache_size=settings.get('cache_size'),
+        no_cache=settings.get('no_cache', False),
+        trace=str(job_root / "trace.json") if settings.get('trace') else None,
+        vpk=str(job_root / f"{job['name']}.vpk") if settings.get('vpk') else None,
+        vpk_version=settings.get('vpk_version'),
+        max_texture_size=settings.get('max_texture_size'),
+        no_textures=settings.get('no_textures', False),
+        # One slot pool for all jobs: studiomdl runs are bounded batch-wide
+        compile_dir=settings.get('compile_dir') or str(Path(settings['output']) / "_compile"),
+        compile_workers=settings.get('compile_workers'),
+        compile_timeout=settings.get('compile_timeout'),
+        fit_bbox=settings.get('fit_bbox', False),
+        prune_bones=settings.get('prune_bones', False),
+        lods=settings.get('lods'),
+        lod_switch=settings.get('lod_switch'),
+    )
+
+def shared_models(settings, jobs):
+    """Unique models to decompile once for the whole batch"""
+    data_dir = Path(settings['data'])
+    models = {}
+    for job in jobs:
+        anim = job['weapon'].replace('.mdl', '_anim.mdl')
+        for model in (job['weapon'], job['gloves'], anim):
+            if model == anim and not (data_dir / anim).exists():
+                continue
+            models.setdefault(model, job)
+    return models
+
+def prime_model(settings, job, model):
+    """Decompile one model into the shared cache"""
+    log_to_console()
+    try:
+        with contextlib.redirect_stdout(None):
+            converter = Converter(job_args(settings, job))
+            with tempfile.TemporaryDirectory() as temp_dir:
+                smd = converter.decompile_model(converter.data_dir / model, Path(temp_dir))
+        return model, smd is not None
+    except Exception:
+        return model, False
+
+def run_job(settings, job):
+    """Run one conversion with its own output/work dir and log"""
+    job_root = Path(settings['output']) / job['name']
+    job_root.mkdir(parents=True, exist_ok=True)
+    log_path = job_root / "job.log"
+
+    result = dict(job)
+    result['output'] = str(job_root)
+    result['log'] = str(log_path)
+    result['error'] = None
+
+    result['stages'] = {}
+    # Workers started by spawn (Windows) do not inherit the parent's handlers
+    log_to_console()
+    start = time.perf_counter()
+    cache_before = directory_cache.stats()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        with contextlib.redirect_stdout(log):
+            try:
+                converter = Converter(job_args(settings, job))
+                success = converter.main()
+                result['status'] = 'success' if success else 'failed'
+                result['stages'] = converter.tracer.totals()
+                result['staging'] = converter.stager.stats()
+                result['store'] = converter.store.stats()
+                result['compile_wait_s'] = round(converter.compile_pool.waited, 3)
+                result['diagnostics'] = converter.diagnostics
+            except Exception as e:
+                traceback.print_exc(file=log)
+                result['status'] = 'error'
+                result['error'] = str(e)
+    result['duration'] = round(time.perf_counter() - start, 3)
+
+    # Texture probes served per job (the cache lives as long as the worker process)
+    cache_after = directory_cache.stats()
+    result['dir_cache'] = {key: cache_after[key] - cache_before[key] for key in ('hits', 'misses', 'indexed')}
+    return result
+
+def validate_jobs(settings, jobs):
+    """Check jobs against the data catalog. Returns (runnable jobs, results of invalid ones)"""
+    catalog = Catalog(settings['data'], settings.get('catalog_db'))
+    try:
+        counts = catalog.scan()
+        print(f"[batch] Catalog: {counts['added'] + counts['updated']} files indexed, {counts['unchanged']} unchanged")
+        runnable, invalid = [], []
+        for job in jobs:
+            errors, warnings = catalog.validate(job['weapon'], job['gloves'])
+            job['warnings'] = warnings
+            for warning in warnings:
+                print(f"[batch] {job['name']}: {warning}")
+            if errors:
+                invalid.append(dict(job, status='invalid', error='; '.join(errors), duration=0, output=None, log=None))
+                print(f"[batch] INVALID: {job['name']} ({'; '.join(errors)})")
+            else:
+                runnable.append(job)
+    finally:
+        catalog.close()
+    return runnable, invalid
+
+def run_batch(settings, jobs, workers):
+    """Decompile shared inputs, run all jobs, write summary"""
+    output_dir = Path(settings['output'])
+    output_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+
+    results = []
+    all_jobs = jobs
+    if settings.get('catalog'):
+        # Fail broken jobs before any decompile/compile work
+        jobs, results = validate_jobs(settings, jobs)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # 1. Shared decompiles (each model once, jobs then hit the cache)
+        if not settings.get('no_cache'):
+            models = shared_models(settings, jobs)
+            print(f"[batch] 1. Decompiling {len(models)} shared models")
+            futures = [pool.submit(prime_model, settings, job, model) for model, job in models.items()]
+            for future in as_completed(futures):
+                model, ok = future.result()
+                if not ok:
+                    print(f"[batch] Decompile failed: {model}")
+
+        # 2. Jobs
+        print(f"\n[batch] 2. Running {len(jobs)} jobs ({workers} workers)")
+        futures = {pool.submit(run_job, settings, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = dict(job, status='error', error=str(e), duration=None, output=None, log=None)
+            results.append(result)
+            print(f"[batch] {result['status'].upper()}: {result['name']} ({result['duration']}s)")
+
+    # Keep manifest order in the summary
+    order = {job['name']: i for i, job in enumerate(all_jobs)}
+    results.sort(key=lambda r: order[r['name']])
+    succeeded = sum(1 for r in results if r['status'] == 'success')
+    summary = {
+        'jobs': results,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'duration': round(time.perf_counter() - start, 3),
+        # Animations, VMTs and VTFs shared by all jobs
+        'store': ContentStore(output_dir / "_store").usage(),
+    }
+    summary_path = output_dir / "batch_summary.json"
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    if settings.get('trace'):
+        merge_traces(settings['trace'], results)
+
+    store = summary['store']
+    print(f"[batch] Store: {store['objects']} objects ({store['stored_bytes']:,} bytes) "
+          f"for {store['refs']} placed files ({store['placed_bytes']:,} bytes)")
+    print(f"\n[batch] {succeeded}/{len(results)} succeeded, summary: {summary_path}")
+    return summary
+
+def merge_traces(trace_path, results):
+    """One Chrome trace with a track per job"""
+    events = []
+    for pid, result in enumerate(results, 1):
+        job_trace = Path(result['output'] or '') / "trace.json"
+        if not result['output'] or not job_trace.exists():
+            continue
+        with open(job_trace, 'r', encoding='utf-8') as f:
+            job_events = json.load(f)['traceEvents']
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': result['name']}})
+        for event in job_events:
+            event['pid'] = pid
+            events.append(event)
+    write_trace(trace_path, events)
+    print(f"[batch] Trace written: {trace_path}")
+
+def parse_args():
+    """Command line"""
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-data', required=True, help='CS:GO data')
+    parser.add_argument('-game', required=True, help='Momentum directory')
+    parser.add_argument('-output', required=True, help='Batch output directory (one subdir per job)')
+    parser.add_argument('-manifest', required=True, help='Job manifest (JSON list of weapon/gloves/type)')
+    parser.add_argument('-workers', type=int, default=4, help='Parallel jobs')
+    parser.add_argument('-crowbar', help='Crowbar decompiler (default: thirdparty)')
+    parser.add_argument('-studiomdl', help='studiomdl (default: <game>/bin/win64)')
+    add_cache_args(parser)
+    parser.add_argument('--trace', help='Write a merged Chrome trace of all jobs (per-job traces go in each job dir)')
+    parser.add_argument('--vpk', action='store_true', help='Pack each job into <job>/<job>.vpk')
+    parser.add_argument('--vpk-version', type=int, choices=[1, 2], default=1, help='VPK format version')
+    add_texture_args(parser)
+    add_compile_args(parser)
+    add_geometry_args(parser)
+    add_lod_args(parser)
+    parser.add_argument('--catalog', action='store_true', help='Validate jobs against the data catalog before running')
+    parser.add_argument('--catalog-db', help='Catalog file (default: user cache dir)')
+
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    try:
+        args = parse_args()
+        log_to_console()
+        output_dir = Path(args.output).resolve()
+        settings = {
+            'data': str(Path(args.data).resolve()),
+            'game': str(Path(args.game).resolve()),
+            'output': str(output_dir),
+            'crowbar': args.crowbar,
+            'studiomdl': args.studiomdl,
+            'cache_dir': args.cache_dir,
+            'cache_size': args.cache_size,
+            'no_cache': args.no_cache,
+            'trace': str(Path(args.trace).resolve()) if args.trace else None,
+            'vpk': args.vpk,
+            'vpk_version': args.vpk_version,
+            'max_texture_size': args.max_texture_size,
+            'no_textures': args.no_textures,
+            'compile_dir': args.compile_dir,
+            'compile_workers': args.compile_workers,
+            'compile_timeout': args.compile_timeout,
+            'fit_bbox': args.fit_bbox,
+            'prune_bones': args.prune_bones,
+            'lods': args.lods,
+            'lod_switch': args.lod_switch,
+            'catalog': args.catalog,
+            'catalog_db': args.catalog_db,
+        }
+        jobs = load_manifest(args.manifest)
+        summary = run_batch(settings, jobs, max(1, args.workers))
+        if summary['failed']:
+            sys.exit(1)
+
+    except Exception as e:
+        print(f"\n[batch] ERROR: {e}")
+        sys.exit(1)
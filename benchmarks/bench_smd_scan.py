@@ -0,0 +1,77 @@
+"""
+skin2momentum
+bench_smd_scan - streaming find_materials_from_smd vs the original read_text/regex scanner
+"""
+
+import re
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from vmt_fixer import find_materials_from_smd
+from corpus import write_smd
+
+def find_materials_legacy(smd_file):
+    """Original implementation (whole file in memory, regex per line, list dedup)"""
+    try:
+        content = smd_file.read_text(encoding='utf-8', errors='ignore')
+        materials = []
+        in_triangles = False
+
+        for line in content.splitlines():
+            line = line.strip()
+            if line == 'triangles':
+                in_triangles = True
+            elif line == 'end':
+                in_triangles = False
+            elif in_triangles and line and not re.match(r'^[\d\.\-\s]+$', line) and len(line.split()) == 1:
+                if line not in materials:
+                    materials.append(line)
+        return materials
+    except:
+        return []
+
+def timed(func, path, repeat):
+    """Best of repeat"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-triangles', type=int, nargs='+', default=[10000, 100000, 300000])
+    parser.add_argument('-materials', type=int, nargs='+', default=[4, 500, 5000])
+    parser.add_argument('-repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'triangles':>10} {'materials':>10} {'size MB':>8} {'legacy s':>9} {'stream s':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for triangles in args.triangles:
+            for materials in args.materials:
+                if materials > triangles:
+                    continue
+                smd = Path(temp_dir) / f"bench_{triangles}_{materials}.smd"
+                write_smd(smd, triangles, materials)
+
+                legacy_time, legacy = timed(find_materials_legacy, smd, args.repeat)
+                stream_time, stream = timed(find_materials_from_smd, smd, args.repeat)
+                if legacy != stream:
+                    print(f"[bench_smd_scan] Mismatch for {smd.name}")
+                    return 1
+
+                size = smd.stat().st_size / 1024 ** 2
+                print(f"{triangles:>10} {materials:>10} {size:>8.1f} {legacy_time:>9.3f} {stream_time:>9.3f} {legacy_time / stream_time:>7.1f}x")
+                smd.unlink()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+skin2momentum
+corpus - synthetic CS:GO-like inputs (SMDs, animation sets, materials trees, model data dirs)
+"""
+
+import json
+import random
+import struct
+from pathlib import Path
+
+GAMEINFO = '"GameInfo"\n{\n\tgame "Momentum Mod"\n\tFileSystem\n\t{\n\t\tSearchPaths\n\t\t{\n\t\t\tgame |gameinfo_path|.\n\t\t}\n\t}\n}\n'
+
+def write_smd(path, triangles, materials, bones=2, seed=0):
+    """Reference SMD with N triangles spread over M materials (names or a count)"""
+    rng = random.Random(seed)
+    names = materials if isinstance(materials, list) else [f"material_{i:05d}" for i in range(materials)]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('version 1\nnodes\n')
+        for bone in range(bones):
+            f.write(f'{bone} "bone_{bone}" {bone - 1}\n')
+        f.write('end\nskeleton\ntime 0\n')
+        for bone in range(bones):
+            f.write(f'{bone} {bone}.000000 0.000000 0.000000 0.000000 0.000000 0.000000\n')
+        f.write('end\ntriangles\n')
+        for i in range(triangles):
+            # Every material appears at least once, in order, then at random
+            f.write(f"{names[i] if i < len(names) else rng.choice(names)}\n")
+            for _ in range(3):
+                x, y, z = (rng.uniform(-10, 10) for _ in range(3))
+                bone = rng.randrange(bones)
+                f.write(f"{bone} {x:.6f} {y:.6f} {z:.6f} 0.000000 0.000000 1.000000 "
+                        f"{rng.random():.6f} {rng.random():.6f} 1 {bone} 1.000000\n")
+        f.write('end\n')
+
+def write_anim_smd(path, frames, bones=2, seed=0):
+    """Animation SMD (skeleton only)"""
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('version 1\nnodes\n')
+        for bone in range(bones):
+            f.write(f'{bone} "bone_{bone}" {bone - 1}\n')
+        f.write('end\nskeleton\n')
+        for frame in range(frames):
+            f.write(f'time {frame}\n')
+            for bone in range(bones):
+                f.write(f'{bone} {rng.uniform(-1, 1):.6f} {rng.uniform(-1, 1):.6f} {rng.uniform(-1, 1):.6f} '
+                        f'{rng.uniform(-3, 3):.6f} {rng.uniform(-3, 3):.6f} {rng.uniform(-3, 3):.6f}\n')
+        f.write('end\n')
+
+def write_anim_dir(directory, sequences, frames=30, bones=2):
+    """<model>_anims directory with K sequences, returns the sequence names"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    names = [f"sequence_{i:03d}" for i in range(sequences)]
+    for i, name in enumerate(names):
+        write_anim_smd(directory / f"{name}.smd", frames, bones, seed=i)
+    return names
+
+def write_vmt(path, basetexture, bumpmap=None):
+    """CS:GO-style VMT"""
+    lines = ['"VertexLitGeneric"', '{', f'\t"$basetexture" "{basetexture}"']
+    if bumpmap:
+        lines.append(f'\t"$bumpmap" "{bumpmap}"')
+    lines += ['\t"$phong" "1"', '\t"$phongexponent" "25"', '}']
+    Path(path).write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+def write_vtf(path, size=64):
+    """Minimal VTF 7.2: DXT1 size x size with a full mip chain (smallest first) and no thumbnail"""
+    mips = size.bit_length()
+    header = bytearray(80)
+    struct.pack_into('<4s3I2HI2H', header, 0, b'VTF\0', 7, 2, len(header), size, size, 0, 1, 0)
+    struct.pack_into('<fiBi2BH', header, 48, 1.0, 13, mips, -1, 0, 0, 1)
+    image = b''.join(bytes(max(1, (size >> level) // 4) ** 2 * 8) for level in reversed(range(mips)))
+    Path(path).write_bytes(bytes(header) + image)
+
+def write_materials_tree(materials_dir, dirs, materials_per_dir, seed=0):
+    """materials/models/weapons/... with VMT+VTF pairs, returns every material name"""
+    rng = random.Random(seed)
+    materials_dir = Path(materials_dir)
+    names = []
+    for d in range(dirs):
+        rel_dir = f"models/weapons/v_models/set_{d // 50:03d}/item_{d:05d}"
+        folder = materials_dir / rel_dir
+        folder.mkdir(parents=True, exist_ok=True)
+        for m in range(materials_per_dir):
+            name = f"item{d:05d}_mat{m:02d}"
+            # A mix of the cases fix_vmt handles: own texture, "black" + base texture, normal maps
+            case = rng.randrange(3)
+            if case == 0:
+                write_vmt(folder / f"{name}.vmt", f"{rel_dir}/{name}", f"{rel_dir}/{name}_normal")
+                write_vtf(folder / f"{name}.vtf")
+                write_vtf(folder / f"{name}_normal.vtf")
+            elif case == 1:
+                write_vmt(folder / f"{name}.vmt", "black")
+                write_vtf(folder / f"{name.split('_')[0]}_{name.split('_')[1]}.vtf")
+            else:
+                write_vmt(folder / f"{name}.vmt", name)
+                write_vtf(folder / f"{name}.vtf")
+            names.append(name)
+    return names
+
+def write_model(path, triangles, materials, sequences=0, frames=30, bones=2):
+    """Stand-in .mdl: JSON telling the stub crowbar what to emit"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    spec = {'triangles': triangles, 'materials': materials, 'sequences': sequences,
+            'frames': frames, 'bones': bones}
+    path.write_text(json.dumps(spec), encoding='utf-8')
+    path.with_suffix('.vvd').write_bytes(b'IDSV' + path.read_bytes())
+
+def write_data_tree(data_dir, triangles=20000, sequences=40, material_dirs=200, materials_per_dir=4):
+    """Full -data tree: knife + anim + glove models and a materials tree, returns (weapon, gloves)"""
+    data_dir = Path(data_dir)
+    names = write_materials_tree(data_dir / "materials", material_dirs, materials_per_dir)
+    weapon = "models/weapons/v_knife_bench.mdl"
+    gloves = "models/weapons/v_models/arms/glove_bench/v_glove_bench.mdl"
+    write_model(data_dir / weapon, triangles, names[:4])
+    write_model(data_dir / weapon.replace('.mdl', '_anim.mdl'), 0, [], sequences=sequences)
+    write_model(data_dir / gloves, triangles // 2, names[4:8])
+    return weapon, gloves
+
+def write_game_dir(game_dir):
+    """Momentum dir with gameinfo.txt"""
+    gameinfo = Path(game_dir) / "momentum" / "gameinfo.txt"
+    gameinfo.parent.mkdir(parents=True, exist_ok=True)
+    gameinfo.write_text(GAMEINFO, encoding='utf-8')
+    return Path(game_dir)
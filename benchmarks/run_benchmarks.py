@@ -0,0 +1,163 @@
+"""
+skin2momentum
+run_benchmarks - times the hot paths on a synthetic corpus and fails on regressions
+
+    python benchmarks/run_benchmarks.py                  # compare with baseline.json (created on first run)
+    python benchmarks/run_benchmarks.py -save-baseline   # accept current timings
+    python benchmarks/run_benchmarks.py -scale 4         # bigger corpus
+
+Baselines are machine specific and are not committed.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+sys.path.insert(0, str(BENCH_DIR))
+
+import corpus
+
+STUBS_DIR = BENCH_DIR / "stubs"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+def best_of(repeat, setup, func):
+    """Best wall time of repeat runs (setup is not timed)"""
+    best = None
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            func(state)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench_find_materials(root, scale, repeat):
+    from vmt_fixer import find_materials_from_smd
+    smd = root / "scan.smd"
+    corpus.write_smd(smd, 100000 * scale, 500)
+    return best_of(repeat, lambda: smd, find_materials_from_smd)
+
+def materials_corpus(root, scale):
+    materials_dir = root / "materials"
+    if not materials_dir.exists():
+        corpus.write_materials_tree(materials_dir, 500 * scale, 4)
+    names = [f"item{d:05d}_mat{m:02d}" for d in range(0, 500 * scale, 10) for m in range(4)]
+    return materials_dir, names
+
+def bench_process_materials(root, scale, repeat):
+    from vmt_fixer import process_materials, directory_cache
+    materials_dir, names = materials_corpus(root, scale)
+
+    def setup():
+        directory_cache.invalidate()
+        return root / "out_materials"
+    return best_of(repeat, setup, lambda output: process_materials(materials_dir, output, names))
+
+def bench_cdmaterials(root, scale, repeat):
+    from vmt_fixer import get_cdmaterials_paths
+    materials_dir, names = materials_corpus(root, scale)
+    return best_of(repeat, lambda: None, lambda _: get_cdmaterials_paths(materials_dir, names))
+
+def bench_fix_vmt(root, scale, repeat):
+    from vmt_fixer import fix_vmt, DirectoryCache
+    from material_index import MaterialIndex
+    materials_dir, names = materials_corpus(root, scale)
+    index = MaterialIndex.load(materials_dir)
+    jobs = []
+    for name in names:
+        for vmt in index.find_vmts(name):
+            jobs.append((vmt.read_text(encoding='utf-8'), name, vmt.relative_to(index.root)))
+
+    def run(dir_cache):
+        for content, name, rel_path in jobs:
+            fix_vmt(content, name, rel_path, index.root, dir_cache=dir_cache)
+    return best_of(repeat, DirectoryCache, run)
+
+def bench_convert(root, scale, repeat):
+    from skin2momentum import Converter
+    data_dir = root / "data"
+    if not data_dir.exists():
+        weapon, gloves = corpus.write_data_tree(data_dir, triangles=20000 * scale, sequences=40 * scale)
+    else:
+        weapon, gloves = "models/weapons/v_knife_bench.mdl", "models/weapons/v_models/arms/glove_bench/v_glove_bench.mdl"
+    game_dir = corpus.write_game_dir(root / "game")
+
+    def setup():
+        args = argparse.Namespace(
+            data=str(data_dir), game=str(game_dir), output=str(root / "convert_out"),
+            weapon=weapon, gloves=gloves, type='knife',
+            crowbar=str(STUBS_DIR / "crowbar"), studiomdl=str(STUBS_DIR / "studiomdl"),
+            no_cache=True, force=True, max_texture_size=32,
+        )
+        return Converter(args)
+
+    def run(converter):
+        if not converter.main():
+            raise RuntimeError("[run_benchmarks] Conversion failed")
+    return best_of(repeat, setup, run)
+
+BENCHMARKS = {
+    'find_materials_from_smd': bench_find_materials,
+    'process_materials': bench_process_materials,
+    'get_cdmaterials_paths': bench_cdmaterials,
+    'fix_vmt': bench_fix_vmt,
+    'convert': bench_convert,
+}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-scale', type=int, default=1, help='Corpus size multiplier')
+    parser.add_argument('-repeat', type=int, default=5, help='Runs per benchmark (best is kept)')
+    parser.add_argument('-threshold', type=float, default=0.3, help='Allowed slowdown vs baseline (0.3 = 30%%)')
+    parser.add_argument('-baseline', default=str(DEFAULT_BASELINE), help='Baseline timings JSON')
+    parser.add_argument('-save-baseline', action='store_true', help='Store current timings as the baseline')
+    parser.add_argument('-only', nargs='+', choices=list(BENCHMARKS), help='Run a subset')
+    args = parser.parse_args()
+
+    baseline_path = Path(args.baseline)
+    baseline = {}
+    if baseline_path.exists():
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    key = f"scale={args.scale}"
+
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        # Keep index/decompile caches out of the user's cache dir
+        os.environ['XDG_CACHE_HOME'] = str(root / "cache")
+        for name in args.only or BENCHMARKS:
+            results[name] = BENCHMARKS[name](root, args.scale, args.repeat)
+
+    previous = baseline.get(key, {})
+    regressions = []
+    print(f"{'benchmark':<26} {'seconds':>9} {'baseline':>9} {'change':>8}")
+    for name, seconds in results.items():
+        reference = previous.get(name)
+        change = f"{(seconds / reference - 1) * 100:+7.1f}%" if reference else "     new"
+        print(f"{name:<26} {seconds:>9.4f} {reference or 0:>9.4f} {change}")
+        if reference and seconds > reference * (1 + args.threshold):
+            regressions.append(name)
+
+    if args.save_baseline or not previous:
+        baseline[key] = {**previous, **results}
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"[run_benchmarks] Baseline saved: {baseline_path}")
+        return 0
+
+    if regressions:
+        print(f"[run_benchmarks] Regressed beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
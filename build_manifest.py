@@ -0,0 +1,102 @@
+"""
+skin2momentum
+build_manifest - input/output hashes per pipeline stage for incremental rebuilds
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from decompile_cache import file_digest
+from events import get_logger
+
+logger = get_logger('build_manifest')
+
+# Bump when stage inputs change meaning
+MANIFEST_FORMAT = 1
+
+class BuildManifest:
+
+    def __init__(self, manifest_path, force=False):
+        """Load the previous build (ignored with force)"""
+        self.path = Path(manifest_path)
+        self.root = self.path.parent
+        self.previous = {}
+        self.stages = {}
+        self.inputs = {}
+        self._digests = {}
+
+        if not force and self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('format') == MANIFEST_FORMAT:
+                    self.previous = data.get('stages', {})
+            except (OSError, ValueError) as e:
+                logger.warning(f"[build_manifest] Ignoring unreadable manifest: {e}")
+
+    def begin(self):
+        """Start another run in this process (compared against the last saved one)"""
+        self.stages = {}
+        self.inputs = {}
+
+    def digest(self, path):
+        """File hash (memoized by size/mtime for this run)"""
+        stat = os.stat(path)
+        key = (str(path), stat.st_size, stat.st_mtime_ns)
+        if key not in self._digests:
+            self._digests[key] = file_digest(path).hexdigest()
+        return self._digests[key]
+
+    def fingerprint(self, *parts):
+        """Hash of files (by content), strings and lists of either"""
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, (list, tuple)):
+                digest.update(self.fingerprint(*part).encode())
+            elif isinstance(part, Path):
+                digest.update(f"file:{part.name}:{self.digest(part)}\0".encode())
+            else:
+                digest.update(f"str:{part}\0".encode())
+        return digest.hexdigest()
+
+    def record_input(self, path):
+        """Keep a named input hash in the manifest"""
+        self.inputs[Path(path).resolve().as_posix()] = self.digest(path)
+
+    def up_to_date(self, stage, inputs):
+        """True if the last build ran stage with the same inputs and its outputs are untouched"""
+        previous = self.previous.get(stage)
+        if not previous or previous.get('inputs') != inputs:
+            return False
+        for rel, digest in previous.get('outputs', {}).items():
+            path = self.root / rel
+            if not path.is_file() or self.digest(path) != digest:
+                return False
+        self.stages[stage] = previous
+        return True
+
+    def record(self, stage, inputs, outputs):
+        """Store a completed stage"""
+        self.stages[stage] = {
+            'inputs': inputs,
+            'outputs': {self._rel(path): self.digest(path) for path in outputs},
+        }
+
+    def outputs(self, stage):
+        """Output paths of a stage from this run"""
+        return [self.root / rel for rel in self.stages.get(stage, {}).get('outputs', {})]
+
+    def save(self):
+        """Write manifest next to the output"""
+        data = {'format': MANIFEST_FORMAT, 'inputs': self.inputs, 'stages': self.stages}
+        self.root.mkdir(parents=True, exist_ok=True)
+        temp_file = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_file, self.path)
+        # The next run in this process (--watch) builds on this one
+        self.previous = dict(self.stages)
+
+    def _rel(self, path):
+        return Path(os.path.relpath(path, self.root)).as_posix()
@@ -0,0 +1,313 @@
+"""
+skin2momentum
+catalog - SQLite catalog of models, materials and textures under -data (rescanned by mtime)
+"""
+
+import os
+import sys
+import json
+import struct
+import sqlite3
+import hashlib
+import argparse
+from pathlib import Path
+from decompile_cache import default_cache_root
+from mdl import read_mdl
+from vtf import read_header
+from vmt_fixer import texture_keys
+
+CATALOG_FORMAT = 1
+CATALOG_SUFFIXES = ('.mdl', '.vmt', '.vtf')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER);
+CREATE TABLE IF NOT EXISTS models (
+    path TEXT PRIMARY KEY, name TEXT, version INTEGER, bone_count INTEGER,
+    sequence_count INTEGER, skeleton TEXT, error TEXT);
+CREATE TABLE IF NOT EXISTS model_bones (model TEXT, idx INTEGER, name TEXT, parent INTEGER);
+CREATE TABLE IF NOT EXISTS model_materials (model TEXT, material TEXT);
+CREATE TABLE IF NOT EXISTS model_cdmaterials (model TEXT, path TEXT);
+CREATE TABLE IF NOT EXISTS materials (path TEXT PRIMARY KEY, file TEXT, name TEXT, shader TEXT);
+CREATE TABLE IF NOT EXISTS material_textures (material TEXT, key TEXT, texture TEXT);
+CREATE TABLE IF NOT EXISTS textures (
+    path TEXT PRIMARY KEY, file TEXT, width INTEGER, height INTEGER, format TEXT, mips INTEGER, error TEXT);
+CREATE INDEX IF NOT EXISTS models_skeleton ON models (skeleton);
+CREATE INDEX IF NOT EXISTS model_bones_model ON model_bones (model);
+CREATE INDEX IF NOT EXISTS model_materials_model ON model_materials (model);
+CREATE INDEX IF NOT EXISTS model_cdmaterials_model ON model_cdmaterials (model);
+CREATE INDEX IF NOT EXISTS materials_name ON materials (name);
+CREATE INDEX IF NOT EXISTS material_textures_material ON material_textures (material);
+"""
+
+def normalize(path):
+    """Source engine path key: forward slashes, lower case, no extension"""
+    path = str(path).replace('\\', '/').strip('/').lower()
+    stem, dot, ext = path.rpartition('.')
+    return stem if dot and ext in ('vmt', 'vtf') else path
+
+def skeleton_signature(bones):
+    """Hash of bone names and hierarchy (case-insensitive)"""
+    text = '\n'.join(f"{name.lower()}:{parent}" for name, parent in bones)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def default_catalog_path(data_dir):
+    """<cache>/catalog/<hash of data dir>.sqlite"""
+    key = hashlib.sha1(str(Path(data_dir).resolve()).encode()).hexdigest()
+    return default_cache_root() / "catalog" / f"{key}.sqlite"
+
+class Catalog:
+
+    def __init__(self, data_dir, db_path=None):
+        """Open (or create) the catalog of data_dir"""
+        self.data_dir = Path(data_dir).resolve()
+        self.materials_dir = self.data_dir / "materials"
+        self.path = Path(db_path) if db_path else default_catalog_path(self.data_dir)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript(SCHEMA)
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'format'").fetchone()
+        if row is None or int(row[0]) != CATALOG_FORMAT:
+            self._reset()
+
+    def _reset(self):
+        """Start over (older catalog format)"""
+        with self.db:
+            for table in ('files', 'models', 'model_bones', 'model_materials', 'model_cdmaterials',
+                          'materials', 'material_textures', 'textures'):
+                self.db.execute(f"DELETE FROM {table}")
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('format', ?)", (str(CATALOG_FORMAT),))
+
+    def close(self):
+        self.db.close()
+
+    def _walk(self):
+        """(relative posix path, absolute path, stat) of catalogued files"""
+        stack = [str(self.data_dir)]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith(CATALOG_SUFFIXES):
+                        path = Path(entry.path)
+                        yield path.relative_to(self.data_dir).as_posix(), path, entry.stat()
+
+    def scan(self):
+        """Add or refresh files whose mtime/size changed, drop removed ones. Returns counts."""
+        known = {path: (mtime, size) for path, mtime, size in self.db.execute("SELECT path, mtime_ns, size FROM files")}
+        counts = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        seen = set()
+        with self.db:
+            for rel, path, stat in self._walk():
+                seen.add(rel)
+                state = (stat.st_mtime_ns, stat.st_size)
+                previous = known.get(rel)
+                if previous == state:
+                    counts['unchanged'] += 1
+                    continue
+                if previous:
+                    self._forget(rel)
+                self._add(rel, path)
+                self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (rel, *state))
+                counts['updated' if previous else 'added'] += 1
+
+            for rel in known.keys() - seen:
+                self._forget(rel)
+                self.db.execute("DELETE FROM files WHERE path = ?", (rel,))
+                counts['removed'] += 1
+        return counts
+
+    def _material_key(self, path):
+        try:
+            return normalize(path.relative_to(self.materials_dir).as_posix())
+        except ValueError:
+            return normalize(path.relative_to(self.data_dir).as_posix())
+
+    def _add(self, rel, path):
+        suffix = path.suffix.lower()
+        if suffix == '.mdl':
+            self._add_model(rel, path)
+        elif suffix == '.vmt':
+            key = self._material_key(path)
+            content = path.read_text(encoding='utf-8', errors='ignore')
+            shader = content.strip().split(None, 1)[0].strip('"').lower() if content.strip() else ''
+            self.db.execute("INSERT OR REPLACE INTO materials VALUES (?, ?, ?, ?)",
+                            (key, rel, key.rpartition('/')[2], shader))
+            self.db.executemany("INSERT INTO material_textures VALUES (?, ?, ?)",
+                                [(key, name, normalize(texture)) for name, texture in texture_keys(content)])
+        else:
+            key = self._material_key(path)
+            try:
+                header = read_header(path)
+                values = (header.width, header.height, header.format_name, header.mip_count, None)
+            except (OSError, ValueError, struct.error) as e:
+                # Truncated files fail in struct.unpack_from
+                values = (None, None, None, None, str(e))
+            self.db.execute("INSERT OR REPLACE INTO textures VALUES (?, ?, ?, ?, ?, ?, ?)", (key, rel, *values))
+
+    def _add_model(self, rel, path):
+        try:
+            info = read_mdl(path)
+        except (OSError, ValueError, IndexError, struct.error) as e:
+            self.db.execute("INSERT OR REPLACE INTO models VALUES (?, ?, NULL, 0, 0, NULL, ?)",
+                            (rel, path.stem.lower(), str(e)))
+            return
+        self.db.execute("INSERT OR REPLACE INTO models VALUES (?, ?, ?, ?, ?, ?, NULL)",
+                        (rel, path.stem.lower(), info.version, len(info.bones), info.sequence_count,
+                         skeleton_signature(info.bones)))
+        self.db.executemany("INSERT INTO model_bones VALUES (?, ?, ?, ?)",
+                            [(rel, i, name, parent) for i, (name, parent) in enumerate(info.bones)])
+        self.db.executemany("INSERT INTO model_materials VALUES (?, ?)",
+                            [(rel, material.replace('\\', '/').lower()) for material in info.materials])
+        self.db.executemany("INSERT INTO model_cdmaterials VALUES (?, ?)",
+                            [(rel, normalize(cd)) for cd in info.cdmaterials])
+
+    def _forget(self, rel):
+        for table, column in (('models', 'path'), ('model_bones', 'model'), ('model_materials', 'model'),
+                              ('model_cdmaterials', 'model'), ('textures', 'file')):
+            self.db.execute(f"DELETE FROM {table} WHERE {column} = ?", (rel,))
+        for (key,) in self.db.execute("SELECT path FROM materials WHERE file = ?", (rel,)).fetchall():
+            self.db.execute("DELETE FROM material_textures WHERE material = ?", (key,))
+        self.db.execute("DELETE FROM materials WHERE file = ?", (rel,))
+
+    def models(self, like=None):
+        """[{path, bones, sequences, anim_model, error}] (like: SQL LIKE on the path)"""
+        rows = self.db.execute(
+            """SELECT m.path, m.bone_count, m.sequence_count, m.error,
+                      EXISTS(SELECT 1 FROM models a WHERE a.path = substr(m.path, 1, length(m.path) - 4) || '_anim.mdl')
+               FROM models m WHERE m.path LIKE ? ORDER BY m.path""", (like or '%',))
+        return [{'path': path, 'bones': bones, 'sequences': sequences, 'error': error, 'anim_model': bool(anim)}
+                for path, bones, sequences, error, anim in rows]
+
+    def model(self, reference):
+        """Catalog path of a model given as data-relative path or file name"""
+        reference = reference.replace('\\', '/')
+        row = self.db.execute("SELECT path FROM models WHERE path = ? OR name = ? ORDER BY path",
+                              (reference, Path(reference).stem.lower())).fetchone()
+        return row[0] if row else None
+
+    def skeleton_matches(self, reference, like=None):
+        """Models with exactly the reference skeleton (reference: catalogued model or any .mdl file)"""
+        path = self.model(reference)
+        if path:
+            signature = self.db.execute("SELECT skeleton FROM models WHERE path = ?", (path,)).fetchone()[0]
+        else:
+            signature = skeleton_signature(read_mdl(reference).bones)
+        return [row[0] for row in self.db.execute(
+            "SELECT path FROM models WHERE skeleton = ? AND path LIKE ? AND path != ? ORDER BY path",
+            (signature, like or '%', path or ''))]
+
+    def missing_textures(self):
+        """[(material, key, texture)] whose texture has no VTF"""
+        return self.db.execute(
+            """SELECT t.material, t.key, t.texture FROM material_textures t
+               LEFT JOIN textures x ON x.path = t.texture
+               WHERE x.path IS NULL ORDER BY t.material, t.key""").fetchall()
+
+    def missing_materials(self, model):
+        """Materials of a model without any VMT of that name"""
+        return [row[0] for row in self.db.execute(
+            """SELECT mm.material FROM model_materials mm
+               WHERE mm.model = ? AND NOT EXISTS (
+                   SELECT 1 FROM materials m WHERE m.name = mm.material OR m.path = mm.material)
+               ORDER BY mm.material""", (model,))]
+
+    def bones(self, model):
+        return [row[0] for row in self.db.execute("SELECT name FROM model_bones WHERE model = ? ORDER BY idx", (model,))]
+
+    def validate(self, weapon, gloves):
+        """(errors, warnings) for a weapon/gloves pair, without running any tool"""
+        errors, warnings = [], []
+        paths = {}
+        for role, reference in (('weapon', weapon), ('gloves', gloves)):
+            path = self.model(reference)
+            if not path:
+                errors.append(f"{role} model not found: {reference}")
+                continue
+            error = self.db.execute("SELECT error FROM models WHERE path = ?", (path,)).fetchone()[0]
+            if error:
+                errors.append(f"{role} model unreadable: {error}")
+                continue
+            paths[role] = path
+            missing = self.missing_materials(path)
+            if missing:
+                warnings.append(f"{role} materials without VMT: {', '.join(missing)}")
+            textures = self.db.execute(
+                """SELECT DISTINCT t.texture FROM model_materials mm
+                   JOIN materials m ON m.name = mm.material
+                   JOIN material_textures t ON t.material = m.path
+                   LEFT JOIN textures x ON x.path = t.texture
+                   WHERE mm.model = ? AND x.path IS NULL""", (path,)).fetchall()
+            if textures:
+                warnings.append(f"{role} textures missing: {', '.join(row[0] for row in textures)}")
+
+        # Gloves are bonemerged onto the weapon's skeleton
+        if len(paths) == 2:
+            weapon_bones = {name.lower() for name in self.bones(paths['weapon'])}
+            unmatched = [name for name in self.bones(paths['gloves'])[1:] if name.lower() not in weapon_bones]
+            if unmatched:
+                warnings.append(f"glove bones not in weapon skeleton: {', '.join(unmatched)}")
+        return errors, warnings
+
+def main():
+    """python catalog.py -data <dir> scan | models | skeleton <model> | missing-textures | validate -manifest <jobs.json>"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-data', required=True, help='CS:GO data')
+    parser.add_argument('-db', help='Catalog file (default: user cache dir)')
+    parser.add_argument('-no-scan', action='store_true', help='Query without rescanning changed files')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('scan', help='Add/refresh changed files')
+    models = sub.add_parser('models', help='List models')
+    models.add_argument('-like', help="SQL LIKE filter on the path, e.g. '%%v_knife_%%'")
+    skeleton = sub.add_parser('skeleton', help='Models with the same skeleton as a model')
+    skeleton.add_argument('model', help='Catalogued model (path or name) or any .mdl file')
+    skeleton.add_argument('-like', help='SQL LIKE filter on the path')
+    sub.add_parser('missing-textures', help='VMT texture references without a VTF')
+    validate = sub.add_parser('validate', help='Check a batch manifest before converting')
+    validate.add_argument('-manifest', required=True)
+    args = parser.parse_args()
+
+    catalog = Catalog(args.data, args.db)
+    if not args.no_scan or args.command == 'scan':
+        counts = catalog.scan()
+        print(f"[catalog] {counts['added']} added, {counts['updated']} updated, "
+              f"{counts['removed']} removed, {counts['unchanged']} unchanged")
+
+    if args.command == 'models':
+        for model in catalog.models(args.like):
+            details = model['error'] or (f"{model['bones']} bones, {model['sequences']} sequences"
+                                         f"{', anim model' if model['anim_model'] else ''}")
+            print(f"{model['path']}: {details}")
+    elif args.command == 'skeleton':
+        for path in catalog.skeleton_matches(args.model, args.like):
+            print(path)
+    elif args.command == 'missing-textures':
+        for material, key, texture in catalog.missing_textures():
+            print(f"{material}: ${key} {texture}")
+    elif args.command == 'validate':
+        with open(args.manifest, 'r', encoding='utf-8') as f:
+            jobs = json.load(f)
+        jobs = jobs.get('jobs', []) if isinstance(jobs, dict) else jobs
+        failed = 0
+        for job in jobs:
+            errors, warnings = catalog.validate(job['weapon'], job['gloves'])
+            failed += bool(errors)
+            status = 'INVALID' if errors else 'OK'
+            print(f"[catalog] {status}: {job['weapon']} + {job['gloves']}")
+            for message in errors + warnings:
+                print(f"    {message}")
+        if failed:
+            sys.exit(1)
+    catalog.close()
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"[catalog] ERROR: {e}")
+        sys.exit(1)
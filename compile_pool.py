@@ -0,0 +1,115 @@
+"""
+skin2momentum
+compile_pool - bounded studiomdl slots with reusable isolated game directories
+"""
+
+import os
+import time
+import shutil
+import filecmp
+from pathlib import Path
+from contextlib import contextmanager
+from tool_runner import run_tool, STUDIOMDL_PATTERNS
+from events import get_logger
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+logger = get_logger('compile_pool')
+
+COMPILE_TIMEOUT_BASE = 60
+# Extra seconds allowed per MB of input SMDs
+COMPILE_TIMEOUT_PER_MB = 10
+SLOT_POLL_INTERVAL = 0.1
+
+def compile_timeout(smd_files, base=COMPILE_TIMEOUT_BASE, per_mb=COMPILE_TIMEOUT_PER_MB):
+    """Timeout scaled by the size of the SMDs a QC compiles"""
+    size = sum(Path(f).stat().st_size for f in smd_files if Path(f).exists())
+    return base + per_mb * size / (1024 * 1024)
+
+def _try_lock(f):
+    try:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+def _unlock(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class CompilePool:
+    """N game directories (gameinfo.txt pre-copied), each used by one studiomdl at a time.
+
+    Slots are claimed with file locks, so the bound holds across batch worker processes
+    sharing the same pool_dir: a compile takes whichever slot is free first.
+    """
+
+    def __init__(self, pool_dir, gameinfo, workers=None):
+        """Init"""
+        self.root = Path(pool_dir)
+        self.gameinfo = Path(gameinfo)
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.waited = 0.0
+
+    def slot_dir(self, index):
+        return self.root / f"game_{index}"
+
+    def prepare(self, game_dir):
+        """Refresh gameinfo.txt and clear models left by the previous compile"""
+        game_dir.mkdir(parents=True, exist_ok=True)
+        gameinfo_dest = game_dir / "gameinfo.txt"
+        if not gameinfo_dest.exists() or not filecmp.cmp(self.gameinfo, gameinfo_dest, shallow=True):
+            shutil.copy2(self.gameinfo, gameinfo_dest)
+        shutil.rmtree(game_dir / "models", ignore_errors=True)
+
+    @contextmanager
+    def slot(self):
+        """Claim a free game directory (waits while all are busy)"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        while True:
+            for index in range(self.workers):
+                lock = open(self.root / f"game_{index}.lock", 'a+b')
+                if _try_lock(lock):
+                    break
+                lock.close()
+            else:
+                time.sleep(SLOT_POLL_INTERVAL)
+                continue
+            break
+
+        waited = time.perf_counter() - start
+        self.waited += waited
+        if waited >= 1:
+            logger.info(f"[compile_pool] Waited {waited:.1f}s for a free slot")
+        try:
+            game_dir = self.slot_dir(index)
+            self.prepare(game_dir)
+            yield game_dir
+        finally:
+            _unlock(lock)
+            lock.close()
+
+    @contextmanager
+    def compile(self, studiomdl, qc_path, work_dir, timeout, log_path=None):
+        """Run studiomdl in a claimed slot, gives (ToolResult, game_dir) while the slot is still held"""
+        with self.slot() as game_dir:
+            cmd = [
+                str(studiomdl),
+                "-verbose",
+                "-game", str(game_dir),
+                "-nop4",
+                str(qc_path)
+            ]
+            result = run_tool(cmd, timeout, log_path, STUDIOMDL_PATTERNS, cwd=work_dir)
+            yield result, game_dir
@@ -0,0 +1,198 @@
+"""
+skin2momentum
+content_store - content-addressed store shared by jobs, files are linked into place (refcounted, gc)
+"""
+
+import os
+import sys
+import hashlib
+import argparse
+import tempfile
+from pathlib import Path
+from collections import Counter
+from decompile_cache import file_digest
+from staging import clone_or_copy, remove_file
+
+# Digests of source files hashed by this process: (path, mtime_ns, size) -> hex
+_digests = {}
+
+def source_digest(path):
+    """sha256 of a file, memoized while its mtime/size stay the same"""
+    stat = os.stat(path)
+    key = (os.path.normcase(str(path)), stat.st_mtime_ns, stat.st_size)
+    digest = _digests.get(key)
+    if digest is None:
+        digest = _digests[key] = file_digest(path).hexdigest()
+    return digest
+
+class ContentStore:
+    """objects/<digest> holds each distinct file once, refs/ records which output path uses which object.
+
+    Placed files never depend on the object (hardlinks, reflinks and copies all outlive it),
+    so gc() can drop objects whose outputs were removed without breaking anything.
+    """
+
+    def __init__(self, store_dir):
+        """Init"""
+        self.root = Path(store_dir)
+        self.objects_dir = self.root / "objects"
+        self.refs_dir = self.root / "refs"
+        self.added = 0
+        self.reused = 0
+
+    def object_path(self, digest):
+        return self.objects_dir / digest[:2] / digest[2:]
+
+    def put(self, src):
+        """Store src once by content, returns the object path"""
+        digest = source_digest(src)
+        target = self.object_path(digest)
+        if target.exists():
+            self.reused += 1
+            return target
+        return self._add(target, lambda temp_name: clone_or_copy(src, temp_name))
+
+    def put_bytes(self, data):
+        """Store generated content once, returns the object path"""
+        target = self.object_path(hashlib.sha256(data).hexdigest())
+        if target.exists():
+            self.reused += 1
+            return target
+        return self._add(target, lambda temp_name: Path(temp_name).write_bytes(data))
+
+    def _add(self, target, write):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(prefix='.pending-', dir=target.parent)
+        os.close(fd)
+        write(temp_name)
+        # Objects are shared by every link, keep them read-only
+        os.chmod(temp_name, 0o444)
+        os.replace(temp_name, target)
+        self.added += 1
+        return target
+
+    def link(self, src, dst, stager):
+        """Place src at dst through the store (identical files share one object)"""
+        return self._place(self.put(src), dst, stager)
+
+    def link_bytes(self, data, dst, stager):
+        """Place generated content at dst through the store"""
+        return self._place(self.put_bytes(data), dst, stager)
+
+    def _place(self, target, dst, stager):
+        method = stager.stage(target, dst)
+        self._add_ref(target.parent.name + target.name, dst)
+        return method
+
+    def _ref_path(self, dst):
+        key = hashlib.sha1(os.path.normcase(str(Path(dst).resolve())).encode('utf-8')).hexdigest()
+        return self.refs_dir / key[:2] / key[2:]
+
+    def _add_ref(self, digest, dst):
+        """One small file per placed path (re-placing a path replaces its ref, no locking needed)"""
+        ref = self._ref_path(dst)
+        ref.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(prefix='.pending-', dir=ref.parent)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(f"{digest}\t{Path(dst).resolve()}")
+        os.replace(temp_name, ref)
+
+    def _refs(self):
+        """(ref file, digest, placed path) of every ref"""
+        if not self.refs_dir.is_dir():
+            return
+        for ref in self.refs_dir.glob('*/*'):
+            if ref.name.startswith('.pending-'):
+                continue
+            try:
+                digest, path = ref.read_text(encoding='utf-8').split('\t', 1)
+            except (OSError, ValueError):
+                yield ref, None, None
+                continue
+            yield ref, digest, Path(path)
+
+    def _objects(self):
+        """(object path, digest) of every stored object"""
+        if not self.objects_dir.is_dir():
+            return
+        for target in self.objects_dir.glob('*/*'):
+            if not target.name.startswith('.pending-'):
+                yield target, target.parent.name + target.name
+
+    def _still_placed(self, path, digest):
+        """True while path holds the object's content (same inode, or same bytes after a reflink/copy)"""
+        target = self.object_path(digest)
+        try:
+            if os.path.samefile(path, target):
+                return True
+            if path.stat().st_size != target.stat().st_size:
+                return False
+        except OSError:
+            return False
+        return file_digest(path).hexdigest() == digest
+
+    def gc(self, dry_run=False):
+        """Drop refs whose path was deleted or rewritten, then objects no ref counts. Returns counts."""
+        counts = Counter()
+        refcounts = Counter()
+        for ref, digest, path in self._refs():
+            if digest and self._still_placed(path, digest):
+                refcounts[digest] += 1
+                continue
+            counts['dropped_refs'] += 1
+            if not dry_run:
+                ref.unlink(missing_ok=True)
+
+        for target, digest in self._objects():
+            if refcounts[digest]:
+                counts['kept'] += 1
+                continue
+            counts['removed'] += 1
+            counts['freed_bytes'] += target.stat().st_size
+            if not dry_run:
+                remove_file(target)
+        counts['refs'] = sum(refcounts.values())
+        return dict(counts)
+
+    def usage(self):
+        """{objects, stored_bytes, refs, placed_bytes}: placed_bytes is what the outputs would take without the store"""
+        sizes = {digest: target.stat().st_size for target, digest in self._objects()}
+        refs = [digest for _, digest, _ in self._refs() if digest in sizes]
+        return {
+            'objects': len(sizes),
+            'stored_bytes': sum(sizes.values()),
+            'refs': len(refs),
+            'placed_bytes': sum(sizes[digest] for digest in refs),
+        }
+
+    def stats(self):
+        """{added, reused}"""
+        return {'added': self.added, 'reused': self.reused}
+
+def main():
+    """python content_store.py <store> du | python content_store.py <store> gc [-dry-run]"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('store', help='Store directory (batch: <output>/_store)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('du', help='Objects, references and space saved')
+    gc = sub.add_parser('gc', help='Delete objects no output uses any more (run while no job is writing)')
+    gc.add_argument('-dry-run', action='store_true', help='Only report what would be deleted')
+    args = parser.parse_args()
+
+    store = ContentStore(Path(args.store).resolve())
+    if args.command == 'du':
+        usage = store.usage()
+        print(f"[content_store] {usage['objects']} objects ({usage['stored_bytes']:,} bytes) "
+              f"for {usage['refs']} placed files ({usage['placed_bytes']:,} bytes)")
+    else:
+        counts = store.gc(args.dry_run)
+        action = "Would remove" if args.dry_run else "Removed"
+        print(f"[content_store] {action} {counts.get('removed', 0)} objects ({counts.get('freed_bytes', 0):,} bytes), "
+              f"{counts.get('dropped_refs', 0)} stale refs; {counts.get('kept', 0)} objects in use by {counts['refs']} files")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"[content_store] ERROR: {e}")
+        sys.exit(1)
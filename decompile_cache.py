@@ -0,0 +1,142 @@
+"""
+skin2momentum
+decompile_cache - content-addressed cache of Crowbar output (SMD/QC trees)
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+from staging import clone_or_copy
+from events import get_logger
+
+logger = get_logger('decompile_cache')
+
+# Bump when the stored layout changes
+CACHE_FORMAT = 1
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# Files compiled alongside a .mdl that change the decompiled output
+SIBLING_SUFFIXES = ('.vvd', '.vtx', '.phy')
+
+_tool_versions = {}
+
+def default_cache_root():
+    """Per-user cache root"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.environ.get('LOCALAPPDATA')
+    return (Path(base) if base else Path.home() / ".cache") / "skin2momentum"
+
+def file_digest(path, digest=None):
+    """Hash file contents in chunks"""
+    digest = digest or hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest
+
+def tool_version(tool_path):
+    """Hash of the decompiler executable (memoized by size/mtime)"""
+    tool_path = Path(tool_path)
+    stat = tool_path.stat()
+    cache_key = (str(tool_path), stat.st_size, stat.st_mtime_ns)
+    if cache_key not in _tool_versions:
+        _tool_versions[cache_key] = file_digest(tool_path).hexdigest()
+    return _tool_versions[cache_key]
+
+def model_files(model_path):
+    """The .mdl and its .vvd/.vtx/.phy siblings"""
+    files = [model_path]
+    prefix = model_path.stem + '.'
+    for sibling in sorted(model_path.parent.iterdir()):
+        if sibling.name.startswith(prefix) and sibling.name.endswith(SIBLING_SUFFIXES):
+            files.append(sibling)
+    return files
+
+def _tree_size(path):
+    return sum(f.stat().st_size for f in Path(path).rglob('*') if f.is_file())
+
+class DecompileCache:
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        """Init"""
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    def key(self, model_path, decompiler_version):
+        """Cache key for a model and decompiler"""
+        # The decompiled tree is named after the model (<stem>.qc, <stem>_anims/), so the stem is part of the key
+        digest = hashlib.sha256(f"{CACHE_FORMAT}:{decompiler_version}:{model_path.stem}".encode())
+        for path in model_files(model_path):
+            digest.update(path.name[len(model_path.stem):].encode() + b'\0')
+            file_digest(path, digest)
+        return digest.hexdigest()
+
+    def restore(self, key, output_dir):
+        """Copy a cached tree into output_dir, False on miss"""
+        entry = self.cache_dir / key
+        tree = entry / "tree"
+        meta = entry / "meta.json"
+        if not meta.exists():
+            return False
+        try:
+            shutil.copytree(tree, output_dir, dirs_exist_ok=True, copy_function=clone_or_copy)
+            os.utime(meta)
+            return True
+        except OSError as e:
+            # Evicted by another process while copying
+            logger.warning(f"[decompile_cache] Restore failed: {e}")
+            return False
+
+    def store(self, key, source_dir, model_name=""):
+        """Add a decompiled tree to the cache"""
+        entry = self.cache_dir / key
+        if (entry / "meta.json").exists():
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        pending = Path(tempfile.mkdtemp(prefix=".pending-", dir=self.cache_dir))
+        try:
+            shutil.copytree(source_dir, pending / "tree", copy_function=clone_or_copy)
+            with open(pending / "meta.json", 'w', encoding='utf-8') as f:
+                json.dump({'model': model_name, 'size': _tree_size(pending / "tree")}, f)
+            # Publish atomically, another process may have stored it first
+            pending.rename(entry)
+        except OSError:
+            shutil.rmtree(pending, ignore_errors=True)
+            return
+        self.evict()
+
+    def entries(self):
+        """(last_used, size, path) for every complete entry"""
+        entries = []
+        if not self.cache_dir.exists():
+            return entries
+        for entry in self.cache_dir.iterdir():
+            if entry.name.startswith('.'):
+                continue
+            meta = entry / "meta.json"
+            try:
+                with open(meta, 'r', encoding='utf-8') as f:
+                    size = json.load(f).get('size', 0)
+                entries.append((meta.stat().st_mtime, size, entry))
+            except (OSError, ValueError):
+                continue
+        return entries
+
+    def evict(self):
+        """Drop least recently used entries until under max_bytes"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            # Rename first so readers never see a half-deleted entry
+            doomed = entry.with_name(f".evicted-{entry.name}-{os.getpid()}")
+            try:
+                entry.rename(doomed)
+            except OSError:
+                continue
+            shutil.rmtree(doomed, ignore_errors=True)
+            total -= size
+            logger.info(f"[decompile_cache] Evicted: {entry.name[:12]} ({size:,} bytes)")
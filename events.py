@@ -0,0 +1,86 @@
+"""
+skin2momentum
+events - progress reporting: modules log, the CLIs print the log, embedders get Event callbacks
+"""
+
+import sys
+import logging
+import contextvars
+from collections import namedtuple
+from contextlib import contextmanager
+
+LOGGER_NAME = 'skin2momentum'
+
+# kind: 'log' | 'stage_started' | 'stage_finished'
+# data: {'level'} for logs, {'status', 'seconds'} when a stage finishes
+Event = namedtuple('Event', 'kind stage message data')
+
+# Listener of the conversion running in the current thread/task (copied into stage threads)
+_listener = contextvars.ContextVar('listener', default=None)
+# Pipeline stage of the current task
+_stage = contextvars.ContextVar('stage', default=None)
+
+def get_logger(module):
+    """Logger of one module (child of the skin2momentum logger)"""
+    return logging.getLogger(f"{LOGGER_NAME}.{module}")
+
+class ListenerHandler(logging.Handler):
+    """Forwards log records to the listener of the conversion that logged them"""
+
+    def emit(self, record):
+        listener = _listener.get()
+        if listener is not None:
+            try:
+                listener(Event('log', _stage.get(), record.getMessage().strip(), {'level': record.levelname.lower()}))
+            except Exception:
+                self.handleError(record)
+
+class ConsoleHandler(logging.StreamHandler):
+    """Message-only lines on whatever sys.stdout is when the record is logged (batch redirects it per job)"""
+
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(logging.Formatter('%(message)s'))
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+    def emit(self, record):
+        if sys.stdout is not None:
+            super().emit(record)
+
+def log_to_console(level=logging.INFO):
+    """Print the log like the CLIs always have (idempotent)"""
+    logger = logging.getLogger(LOGGER_NAME)
+    if not any(isinstance(handler, ConsoleHandler) for handler in logger.handlers):
+        handler = ConsoleHandler()
+        handler.setLevel(level)
+        logger.addHandler(handler)
+
+@contextmanager
+def listening(listener):
+    """Send the events of everything run inside the block to listener(Event)"""
+    token = _listener.set(listener)
+    try:
+        yield
+    finally:
+        _listener.reset(token)
+
+def enter_stage(stage):
+    """Tag events of the current task (and the threads it starts) with stage"""
+    _stage.set(stage)
+
+def emit(kind, stage=None, message='', **data):
+    """Structured event to the current listener (not logged)"""
+    listener = _listener.get()
+    if listener is not None:
+        listener(Event(kind, stage, message, data))
+
+_logger = logging.getLogger(LOGGER_NAME)
+_logger.setLevel(logging.INFO)
+_logger.addHandler(ListenerHandler())
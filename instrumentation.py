@@ -0,0 +1,157 @@
+"""
+skin2momentum
+instrumentation - per-stage wall/CPU/RSS/IO metrics written as a Chrome trace
+"""
+
+import os
+import sys
+import json
+import time
+import inspect
+import threading
+import functools
+import contextvars
+from pathlib import Path
+from contextlib import contextmanager
+from events import get_logger
+
+try:
+    import resource
+except ImportError:
+    # Windows: wall time and file counts only
+    resource = None
+
+logger = get_logger('instrumentation')
+
+# Innermost open span of the current thread/task
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+def _rusage():
+    """(children CPU seconds, self peak RSS KB, children peak RSS KB)"""
+    if resource is None:
+        return None, None, None
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss is bytes on macOS, KB elsewhere
+    scale = 1024 if sys.platform == 'darwin' else 1
+    return children.ru_utime + children.ru_stime, own.ru_maxrss // scale, children.ru_maxrss // scale
+
+def _io_counters():
+    """(bytes read, bytes written) for this process and its reaped children (Linux)"""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+def _delta(after, before):
+    if after is None or before is None:
+        return None
+    return after - before
+
+class Tracer:
+    """Collects one event per stage call"""
+
+    def __init__(self):
+        self.events = []
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, **args):
+        """Measure a block (concurrent stages share process-wide CPU/IO counters)"""
+        span = dict(args)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        cpu_before, _, _ = _rusage()
+        read_before, written_before = _io_counters()
+        try:
+            yield span
+        finally:
+            end = time.perf_counter()
+            cpu_after, rss_self, rss_children = _rusage()
+            read_after, written_after = _io_counters()
+            _current_span.reset(token)
+
+            cpu = _delta(cpu_after, cpu_before)
+            span.update({
+                'wall_s': round(end - start, 6),
+                'child_cpu_s': round(cpu, 6) if cpu is not None else None,
+                'peak_rss_kb': rss_self,
+                'child_peak_rss_kb': rss_children,
+                'bytes_read': _delta(read_after, read_before),
+                'bytes_written': _delta(written_after, written_before),
+            })
+            event = {
+                'name': name,
+                'ph': 'X',
+                'ts': round((start - self.origin) * 1e6),
+                'dur': round((end - start) * 1e6),
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': span,
+            }
+            with self.lock:
+                self.events.append(event)
+
+    def totals(self):
+        """{stage: {calls, wall_s, child_cpu_s, files}}"""
+        totals = {}
+        for event in self.events:
+            args = event['args']
+            total = totals.setdefault(event['name'], {'calls': 0, 'wall_s': 0.0, 'child_cpu_s': 0.0, 'files': 0})
+            total['calls'] += 1
+            total['wall_s'] = round(total['wall_s'] + args['wall_s'], 6)
+            total['child_cpu_s'] = round(total['child_cpu_s'] + (args['child_cpu_s'] or 0), 6)
+            total['files'] += args.get('files', 0)
+        return totals
+
+    def save(self, trace_path):
+        """Write Chrome trace-event JSON (chrome://tracing, Perfetto)"""
+        write_trace(trace_path, self.events, {'totals': self.totals()})
+        logger.info(f"[instrumentation] Trace written: {trace_path}")
+
+def write_trace(trace_path, events, other_data=None):
+    """Write events as a Chrome trace file"""
+    trace_path = Path(trace_path)
+    trace_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(trace_path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': other_data or {}}, f, indent=1)
+
+def annotate(**metrics):
+    """Add metrics (e.g. files=3) to the innermost open stage"""
+    span = _current_span.get()
+    if span is not None:
+        for key, value in metrics.items():
+            span[key] = span.get(key, 0) + value if type(value) is int else value
+
+def traced(name):
+    """Method decorator: time the call under self.tracer (sync or async)"""
+    def decorator(func):
+        def span_args(args):
+            # First Path argument names the target (model, QC, ...)
+            for arg in args:
+                if isinstance(arg, Path):
+                    return {'target': arg.name}
+            return {}
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                tracer = getattr(self, 'tracer', None)
+                if tracer is None:
+                    return await func(self, *args, **kwargs)
+                with tracer.stage(name, **span_args(args)):
+                    return await func(self, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            tracer = getattr(self, 'tracer', None)
+            if tracer is None:
+                return func(self, *args, **kwargs)
+            with tracer.stage(name, **span_args(args)):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,181 @@
+"""
+skin2momentum
+keyvalues - single-pass Valve KeyValues (VMT) tokenizer/parser with a per-file parse cache
+"""
+
+import os
+import re
+import sys
+import argparse
+import threading
+
+# One pass over the text: "quoted" | { | } | [condition] | bare word (comments skipped).
+# Like the engine, an unterminated quote ends at the end of its line.
+TOKEN_RE = re.compile(r'"([^"\n]*)"?|([{}])|\[([^\]\n]*)\]|//[^\n]*|([^\s"{}\[\]]+)')
+
+# Conditionals that are true on the PC builds we target
+PLATFORM_DEFINES = {'$win32', '$windows', '$win64', '$pc'}
+
+class KeyValues:
+    """A block: name plus ordered [key, value] items (value: str or KeyValues), keys case-insensitive"""
+
+    __slots__ = ('name', 'items')
+
+    def __init__(self, name, items=None):
+        self.name = name
+        self.items = items if items is not None else []
+
+    def get(self, key, default=None):
+        """Last value of key (later entries win, like the engine)"""
+        key = key.lower()
+        for name, value in reversed(self.items):
+            if name.lower() == key:
+                return value
+        return default
+
+    def set(self, key, value):
+        """Replace every entry of key with one (appended if new)"""
+        lowered = key.lower()
+        for item in self.items:
+            if item[0].lower() == lowered:
+                item[1] = value
+                self.items = [i for i in self.items if i[0].lower() != lowered or i is item]
+                return
+        self.items.append([key, value])
+
+    def remove(self, key):
+        key = key.lower()
+        self.items = [item for item in self.items if item[0].lower() != key]
+
+    def values(self):
+        """{lowered key: value} of plain (non-block) entries, last one wins"""
+        return {name.lower(): value for name, value in self.items if isinstance(value, str)}
+
+    def blocks(self):
+        return [value for _, value in self.items if isinstance(value, KeyValues)]
+
+    def copy(self):
+        return KeyValues(self.name, [[name, value.copy() if isinstance(value, KeyValues) else value]
+                                     for name, value in self.items])
+
+    def __repr__(self):
+        return f"KeyValues({self.name!r}, {len(self.items)} items)"
+
+def condition_true(condition):
+    """Evaluate [$WIN32], [!$X360], [$WIN32 || $OSX]... for the PC"""
+    for alternative in condition.split('||'):
+        terms = [term.strip() for term in alternative.split('&&')]
+        if all((term[1:].strip().lower() not in PLATFORM_DEFINES) if term.startswith('!')
+               else (term.lower() in PLATFORM_DEFINES) for term in terms if term):
+            return True
+    return False
+
+def parse(text):
+    """Root KeyValues of a VMT/KeyValues text (the first top-level block, e.g. the shader)"""
+    root = KeyValues('')
+    stack = [root]
+    key = None
+    key_condition = None
+    last = None
+    for match in TOKEN_RE.finditer(text):
+        quoted, brace, condition, bare = match.groups()
+        token = quoted if quoted is not None else bare
+        if token is not None:
+            if key is None:
+                key = token
+            else:
+                last = [key, token]
+                # "key" [$X360] "value"
+                if key_condition is None or condition_true(key_condition):
+                    stack[-1].items.append(last)
+                else:
+                    last = None
+                key = key_condition = None
+        elif brace == '{':
+            block = KeyValues(key or '')
+            # "name" [$X360] { ... } is parsed but not kept
+            if key_condition is None or condition_true(key_condition):
+                stack[-1].items.append([key or '', block])
+            stack.append(block)
+            key = key_condition = last = None
+        elif brace == '}':
+            if len(stack) > 1:
+                stack.pop()
+            key = key_condition = last = None
+        elif condition is not None:
+            if key is not None:
+                key_condition = condition
+            elif last is not None:
+                # "key" "value" [$X360]
+                if not condition_true(condition) and stack[-1].items and stack[-1].items[-1] is last:
+                    stack[-1].items.pop()
+                last = None
+    blocks = root.blocks()
+    if not blocks:
+        raise ValueError("[keyvalues] No block found")
+    return blocks[0]
+
+def dump(kv, indent=0):
+    """KeyValues -> text"""
+    pad = '\t' * indent
+    lines = [f'{pad}{kv.name}' if indent == 0 else f'{pad}"{kv.name}"', f'{pad}{{']
+    for name, value in kv.items:
+        if isinstance(value, KeyValues):
+            lines.append(dump(value, indent + 1))
+        else:
+            lines.append(f'{pad}\t"{name}" "{value}"')
+    lines.append(f'{pad}}}')
+    return '\n'.join(lines)
+
+class KeyValuesCache:
+    """Parsed files keyed by path, reparsed when mtime or size changes"""
+
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def load(self, path):
+        """Parsed KeyValues of a file (shared: copy() before editing)"""
+        stat = os.stat(path)
+        key = os.path.normcase(str(path))
+        state = (stat.st_mtime_ns, stat.st_size)
+        entry = self.entries.get(key)
+        if entry and entry[0] == state:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            kv = parse(f.read())
+        with self.lock:
+            self.entries[key] = (state, kv)
+        return kv
+
+    def invalidate(self, path=None):
+        if path is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(os.path.normcase(str(path)), None)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'files': len(self.entries)}
+
+# Shared by every VMT read in this process (a whole batch worker)
+keyvalues_cache = KeyValuesCache()
+
+def main():
+    """python keyvalues.py <file.vmt>... (prints the parsed tree)"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='+')
+    args = parser.parse_args()
+    for path in args.files:
+        print(f"// {path}")
+        print(dump(keyvalues_cache.load(path)))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"[keyvalues] ERROR: {e}")
+        sys.exit(1)
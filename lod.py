@@ -0,0 +1,255 @@
+"""
+skin2momentum
+lod - LOD SMDs by quadric error edge collapse (UV seams, borders and bone weights kept)
+"""
+
+import sys
+import math
+import heapq
+import argparse
+from pathlib import Path
+from smd import np, load_smd, require_numpy
+
+# Relative change that makes a queued collapse cost stale
+COST_TOLERANCE = 1e-9
+
+def _normal(points):
+    """Unnormalised triangle normal of three [x, y, z] lists"""
+    (ax, ay, az), (bx, by, bz), (cx, cy, cz) = points
+    ux, uy, uz = bx - ax, by - ay, bz - az
+    vx, vy, vz = cx - ax, cy - ay, cz - az
+    return uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+class Simplifier:
+    """Half-edge collapse on welded positions.
+
+    Vertices on UV/normal seams, open borders, material borders and non-manifold edges
+    never move, and a vertex only collapses onto one with the same dominant bone, so
+    surviving corners keep their original UVs, normals and weights.
+    """
+
+    def __init__(self, smd):
+        require_numpy("LOD generation")
+        self.smd = smd
+        # Attribute id per corner (position, normal, UV, weights), first corner of each id
+        attributes = np.hstack([smd.positions, smd.normals, smd.uvs, smd.parents[:, None],
+                                smd.link_bones, smd.link_weights])
+        _, attribute_corner, corner_attribute = np.unique(attributes, axis=0, return_index=True, return_inverse=True)
+        corner_attribute = corner_attribute.reshape(-1)
+        self.attribute_corner = attribute_corner
+        # Geometric vertex id per corner
+        self.positions, vertex_corner, corner_vertex = np.unique(smd.positions, axis=0, return_index=True,
+                                                                 return_inverse=True)
+        corner_vertex = corner_vertex.reshape(-1)
+
+        faces = corner_vertex.reshape(-1, 3)
+        valid = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])
+        self.faces = faces[valid].copy()
+        self.face_attributes = corner_attribute.reshape(-1, 3)[valid].copy()
+        self.face_materials = smd.triangle_materials[valid]
+        self.alive = np.ones(len(self.faces), dtype=bool)
+        self.face_count = len(self.faces)
+
+        vertex_count = len(self.positions)
+        self.vertex_faces = [set() for _ in range(vertex_count)]
+        for face, corners in enumerate(self.faces.tolist()):
+            for vertex in corners:
+                self.vertex_faces[vertex].add(face)
+
+        self.position_list = self.positions.tolist()
+        self.points = np.hstack([self.positions, np.ones((vertex_count, 1))])
+        self.quadrics = self._quadrics(vertex_count)
+        self.locked = self._locked(vertex_count, corner_vertex, corner_attribute)
+        self.bones = self._dominant_bones(vertex_corner)
+        self.heap = []
+        self._queue_edges()
+
+    def _quadrics(self, vertex_count):
+        """Area-weighted plane quadrics per vertex"""
+        points = self.positions[self.faces]
+        normals = np.cross(points[:, 1] - points[:, 0], points[:, 2] - points[:, 0])
+        lengths = np.linalg.norm(normals, axis=1)
+        usable = lengths > 1e-12
+        unit = np.zeros_like(normals)
+        unit[usable] = normals[usable] / lengths[usable, None]
+        planes = np.hstack([unit, -np.einsum('ij,ij->i', unit, points[:, 0])[:, None]])
+        face_quadrics = planes[:, :, None] * planes[:, None, :] * (lengths / 2)[:, None, None]
+        quadrics = np.zeros((vertex_count, 4, 4))
+        for k in range(3):
+            np.add.at(quadrics, self.faces[:, k], face_quadrics)
+        return quadrics
+
+    def _locked(self, vertex_count, corner_vertex, corner_attribute):
+        """Seam, material border, open border and non-manifold vertices"""
+        locked = np.zeros(vertex_count, dtype=bool)
+        # Same position with several UV/normal/weight variants
+        variants = np.unique(np.stack([corner_vertex, corner_attribute], axis=1), axis=0)
+        locked |= np.bincount(variants[:, 0], minlength=vertex_count) > 1
+        # Used by more than one material
+        corner_material = np.repeat(self.smd.triangle_materials, 3)
+        materials = np.unique(np.stack([corner_vertex, corner_material], axis=1), axis=0)
+        locked |= np.bincount(materials[:, 0], minlength=vertex_count) > 1
+        # Edges without exactly two faces
+        edges = np.sort(np.concatenate([self.faces[:, [0, 1]], self.faces[:, [1, 2]], self.faces[:, [2, 0]]]), axis=1)
+        unique_edges, counts = np.unique(edges, axis=0, return_counts=True)
+        locked[unique_edges[counts != 2].ravel()] = True
+        self.edges = unique_edges[counts == 2]
+        return locked
+
+    def _dominant_bones(self, vertex_corner):
+        """Highest-weight bone (or parent bone) per vertex"""
+        smd = self.smd
+        if not smd.link_weights.shape[1]:
+            return smd.parents[vertex_corner]
+        weights = smd.link_weights[vertex_corner]
+        best = weights.argmax(axis=1)
+        linked = smd.link_bones[vertex_corner, best]
+        return np.where(weights.max(axis=1) > 0, linked, smd.parents[vertex_corner])
+
+    def _costs(self, sources, targets):
+        """Vectorised error of moving each source onto its target"""
+        quadrics = self.quadrics[sources] + self.quadrics[targets]
+        points = self.points[targets]
+        return np.maximum(np.einsum('ni,nij,nj->n', points, quadrics, points), 0)
+
+    def _cost(self, source, target):
+        """Single-edge _costs (avoids array overhead in the collapse loop)"""
+        point = self.points[target]
+        return max(float(point @ (self.quadrics[source] + self.quadrics[target]) @ point), 0.0)
+
+    def _queue_edges(self):
+        """Initial collapse queue, cheapest direction per edge"""
+        if not len(self.edges):
+            return
+        a, b = self.edges[:, 0], self.edges[:, 1]
+        same_bone = self.bones[a] == self.bones[b]
+        forward = np.where(~self.locked[a] & same_bone, self._costs(a, b), np.inf)
+        backward = np.where(~self.locked[b] & same_bone, self._costs(b, a), np.inf)
+        for u, v, cost_ab, cost_ba in zip(a.tolist(), b.tolist(), forward.tolist(), backward.tolist()):
+            if cost_ab <= cost_ba and cost_ab < math.inf:
+                self.heap.append((cost_ab, u, v))
+            elif cost_ba < math.inf:
+                self.heap.append((cost_ba, v, u))
+        heapq.heapify(self.heap)
+
+    def _queue(self, a, b):
+        options = []
+        if self.bones[a] == self.bones[b]:
+            if not self.locked[a]:
+                options.append((self._cost(a, b), a, b))
+            if not self.locked[b]:
+                options.append((self._cost(b, a), b, a))
+        if options:
+            heapq.heappush(self.heap, min(options))
+
+    def _neighbours(self, vertex):
+        return {other for face in self.vertex_faces[vertex] for other in self.faces[face]} - {vertex}
+
+    def _can_collapse(self, u, v, shared):
+        """Keeps the mesh manifold, no face flips and no UV/normal seam along u-v"""
+        if len(self._neighbours(u) & self._neighbours(v)) != len(shared):
+            return False
+        # A seam ending at u: v differs on each side and u's faces would all get one side's variant
+        if len({self.face_attributes[face][self.faces[face].tolist().index(v)] for face in shared}) > 1:
+            return False
+        target = self.position_list[v]
+        for face in self.vertex_faces[u] - shared:
+            corners = self.faces[face].tolist()
+            points = [self.position_list[corner] for corner in corners]
+            before = _normal(points)
+            points[corners.index(u)] = target
+            after = _normal(points)
+            if _dot(before, after) <= 1e-12 * _dot(before, before):
+                return False
+        return True
+
+    def _collapse(self, u, v, shared):
+        # u's faces take the variant v has on u's side of any seam (the same in every shared face)
+        face = next(iter(shared))
+        variant = self.face_attributes[face][list(self.faces[face]).index(v)]
+        for face in shared:
+            self.alive[face] = False
+            for vertex in self.faces[face]:
+                self.vertex_faces[vertex].discard(face)
+            self.face_count -= 1
+        for face in self.vertex_faces[u]:
+            k = list(self.faces[face]).index(u)
+            self.faces[face][k] = v
+            self.face_attributes[face][k] = variant
+            self.vertex_faces[v].add(face)
+        self.vertex_faces[u] = set()
+        self.quadrics[v] += self.quadrics[u]
+        for other in self._neighbours(v):
+            self._queue(other, v)
+
+    def simplify(self, target):
+        """Collapse edges until at most target faces remain (or nothing can collapse)"""
+        while self.face_count > target and self.heap:
+            cost, u, v = heapq.heappop(self.heap)
+            shared = self.vertex_faces[u] & self.vertex_faces[v]
+            if not shared:
+                continue
+            current = self._cost(u, v)
+            if abs(current - cost) > COST_TOLERANCE * max(1.0, abs(cost)):
+                # Quadrics changed since this entry was queued
+                heapq.heappush(self.heap, (current, u, v))
+                continue
+            if self._can_collapse(u, v, shared):
+                self._collapse(u, v, shared)
+        return self.face_count
+
+    def triangles(self):
+        """(corner indices into the source SMD (N, 3), material per triangle)"""
+        return self.attribute_corner[self.face_attributes[self.alive]], self.face_materials[self.alive]
+
+def lod_path(smd_path, level):
+    """<stem>_lod<level>.smd next to the source"""
+    smd_path = Path(smd_path)
+    return smd_path.with_name(f"{smd_path.stem}_lod{level}.smd")
+
+def generate_lods(smd_path, ratios):
+    """Write one LOD SMD per ratio (each simplified from the previous), returns [(path, before, after)]
+    with before = the previous level's triangle count"""
+    smd = load_smd(smd_path)
+    simplifier = Simplifier(smd)
+    results = []
+    previous = smd.triangle_count
+    for level, ratio in enumerate(ratios, 1):
+        target = max(1, math.ceil(smd.triangle_count * ratio))
+        simplifier.simplify(target)
+        triangles, materials = simplifier.triangles()
+        path = lod_path(smd_path, level)
+        smd.write(path, triangles, materials)
+        results.append((path, previous, len(triangles)))
+        previous = len(triangles)
+    return results
+
+def lod_ratios(text):
+    """'0.5,0.25' -> [0.5, 0.25] (decreasing, each in (0, 1))"""
+    try:
+        ratios = [float(part) for part in text.split(',') if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Not a list of ratios: {text}")
+    if not ratios or any(not 0 < r < 1 for r in ratios) or ratios != sorted(ratios, reverse=True):
+        raise argparse.ArgumentTypeError(f"Ratios must be decreasing and between 0 and 1: {text}")
+    return ratios
+
+def main():
+    """python lod.py <file.smd> -ratios 0.5,0.25"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('smd', help='Reference SMD')
+    parser.add_argument('-ratios', type=lod_ratios, default=[0.5, 0.25], help='Triangle ratios per LOD')
+    args = parser.parse_args()
+
+    for path, before, after in generate_lods(args.smd, args.ratios):
+        print(f"[lod] {path.name}: {before:,} -> {after:,} triangles")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"[lod] ERROR: {e}")
+        sys.exit(1)
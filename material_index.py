@@ -0,0 +1,165 @@
+"""
+skin2momentum
+material_index - single-pass index of a materials tree (.vmt/.vtf by name, files per dir)
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from decompile_cache import default_cache_root
+from events import get_logger
+
+logger = get_logger('material_index')
+
+# Bump when the saved layout changes
+INDEX_FORMAT = 1
+
+# Indexes loaded by this process, reused while fresh (long-lived embedders, batch workers)
+_loaded = {}
+
+class MaterialIndex:
+
+    def __init__(self, materials_dir, dirs=None):
+        """Init from {rel_dir: (mtime_ns, [file names])}"""
+        self.root = Path(materials_dir)
+        self.dir_mtimes = {}
+        self.dir_files = {}
+        self.names = {}
+
+        for rel_dir, (mtime, files) in (dirs or {}).items():
+            self.dir_mtimes[rel_dir] = mtime
+            self.dir_files[rel_dir.lower()] = {name.lower() for name in files}
+            for name in files:
+                rel_path = f"{rel_dir}/{name}" if rel_dir else name
+                self.names.setdefault(name.lower(), []).append(rel_path)
+
+        for paths in self.names.values():
+            paths.sort()
+
+    @classmethod
+    def build(cls, materials_dir):
+        """Scan the tree once"""
+        root = Path(materials_dir)
+        dirs = {}
+        if not root.is_dir():
+            return cls(root, dirs)
+
+        stack = [('', os.stat(root).st_mtime_ns)]
+        while stack:
+            rel_dir, mtime = stack.pop()
+            files = []
+            with os.scandir(root / rel_dir) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        child = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                        stack.append((child, entry.stat().st_mtime_ns))
+                    elif entry.name.lower().endswith(('.vmt', '.vtf')):
+                        files.append(entry.name)
+            dirs[rel_dir] = (mtime, files)
+
+        logger.info(f"[material_index] Indexed {len(dirs)} dirs: {root}")
+        return cls(root, dirs)
+
+    @classmethod
+    def load(cls, materials_dir, cache_dir=None):
+        """Load the saved index if no directory changed, else rebuild and save"""
+        root = Path(materials_dir).resolve()
+        index = _loaded.get(root)
+        if index is not None and index.is_fresh():
+            return index
+
+        cache_dir = Path(cache_dir) if cache_dir else default_cache_root() / "material_index"
+        cache_file = cache_dir / f"{hashlib.sha1(str(root).encode()).hexdigest()}.json"
+
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') == INDEX_FORMAT and data.get('root') == str(root):
+                index = cls(root, data['dirs'])
+                if index.is_fresh():
+                    _loaded[root] = index
+                    return index
+        except (OSError, ValueError, KeyError):
+            pass
+
+        index = cls.build(root)
+        _loaded[root] = index
+        try:
+            index.save(cache_file)
+        except OSError as e:
+            logger.warning(f"[material_index] Could not save index: {e}")
+        return index
+
+    def save(self, cache_file):
+        """Write index to disk"""
+        dirs = {}
+        for rel_dir, mtime in self.dir_mtimes.items():
+            dirs[rel_dir] = (mtime, [])
+        for paths in self.names.values():
+            for rel_path in paths:
+                rel_dir, _, name = rel_path.rpartition('/')
+                dirs[rel_dir][1].append(name)
+
+        cache_file = Path(cache_file)
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'format': INDEX_FORMAT, 'root': str(self.root), 'dirs': dirs}, f)
+        os.replace(temp_file, cache_file)
+
+    def is_fresh(self):
+        """True if no indexed directory was modified (added/removed entries)"""
+        for rel_dir, mtime in self.dir_mtimes.items():
+            try:
+                if os.stat(self.root / rel_dir).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def find(self, filename):
+        """Absolute paths of every file with this name"""
+        return [self.root / rel_path for rel_path in self.names.get(filename.lower(), [])]
+
+    def find_vmts(self, material):
+        """Absolute paths of <material>.vmt"""
+        return self.find(f"{material}.vmt")
+
+    def find_vtfs(self, texture):
+        """Absolute paths of <texture>.vtf"""
+        return self.find(f"{texture}.vtf")
+
+    def resolve(self, rel_path):
+        """Actual path of a file given a case-insensitive path relative to root, or None"""
+        rel_path = str(rel_path).replace('\\', '/').strip('/')
+        wanted = rel_path.lower()
+        for candidate in self.names.get(wanted.rpartition('/')[2], []):
+            if candidate.lower() == wanted:
+                return self.root / candidate
+        return None
+
+    def has_file(self, rel_dir, filename):
+        """True if rel_dir (relative to root) contains filename"""
+        rel_dir = str(rel_dir).replace('\\', '/').strip('/').lower()
+        if rel_dir == '.':
+            rel_dir = ''
+        return filename.lower() in self.dir_files.get(rel_dir, ())
+
+    def listing(self, folder):
+        """Indexed .vmt/.vtf names in folder, None if not under root"""
+        try:
+            rel = Path(folder).relative_to(self.root)
+        except ValueError:
+            return None
+        rel_dir = rel.as_posix().lower()
+        return self.dir_files.get('' if rel_dir == '.' else rel_dir, set())
+
+    def exists(self, path):
+        """Path.exists() replacement for files under root"""
+        path = Path(path)
+        try:
+            rel = path.relative_to(self.root)
+        except ValueError:
+            return path.exists()
+        return self.has_file(rel.parent.as_posix(), rel.name)
@@ -0,0 +1,105 @@
+"""
+skin2momentum
+mdl - studiohdr_t reader (name, bones, materials, $cdmaterials, sequences) without decompiling
+"""
+
+import sys
+import struct
+import argparse
+from pathlib import Path
+
+MDL_SIGNATURE = b'IDST'
+# Bone/texture record sizes of MDL versions 44-49
+BONE_SIZE = 216
+TEXTURE_SIZE = 64
+# (numbones, boneindex) ... field offsets in studiohdr_t
+HEADER = struct.Struct('<4sii64si')
+BONES_OFFSET = 156
+SEQUENCES_OFFSET = 188
+TEXTURES_OFFSET = 204
+INCLUDE_MODELS_OFFSET = 336
+
+class MDLInfo:
+    """What the catalog needs from a compiled model"""
+
+    def __init__(self, name, version, checksum, bones, materials, cdmaterials, sequence_count, include_models):
+        self.name = name
+        self.version = version
+        self.checksum = checksum
+        # [(name, parent index)]
+        self.bones = bones
+        self.materials = materials
+        self.cdmaterials = cdmaterials
+        self.sequence_count = sequence_count
+        self.include_models = include_models
+
+    def describe(self):
+        return (f"{self.name} (v{self.version}): {len(self.bones)} bones, {len(self.materials)} materials, "
+                f"{self.sequence_count} sequences")
+
+def _string(data, offset):
+    """NUL-terminated string at offset"""
+    if offset <= 0 or offset >= len(data):
+        return ''
+    end = data.find(b'\0', offset)
+    return data[offset:end if end >= 0 else len(data)].decode('utf-8', errors='replace')
+
+def _count_index(data, offset):
+    count, index = struct.unpack_from('<ii', data, offset)
+    if count < 0 or (count and not 0 < index < len(data)):
+        raise ValueError(f"[mdl] Corrupt header field at {offset}")
+    return count, index
+
+def read_mdl(mdl_path):
+    """Parse a .mdl header, raises ValueError on anything else"""
+    data = Path(mdl_path).read_bytes()
+    if len(data) < INCLUDE_MODELS_OFFSET + 8 or data[:4] != MDL_SIGNATURE:
+        raise ValueError(f"[mdl] Not a studio model: {mdl_path}")
+    _, version, checksum, name, _ = HEADER.unpack_from(data)
+    name = name.split(b'\0', 1)[0].decode('utf-8', errors='replace')
+
+    bone_count, bone_index = _count_index(data, BONES_OFFSET)
+    bones = []
+    for i in range(bone_count):
+        record = bone_index + i * BONE_SIZE
+        name_offset, parent = struct.unpack_from('<ii', data, record)
+        bones.append((_string(data, record + name_offset), parent))
+
+    sequence_count, _ = _count_index(data, SEQUENCES_OFFSET)
+
+    texture_count, texture_index = _count_index(data, TEXTURES_OFFSET)
+    materials = []
+    for i in range(texture_count):
+        record = texture_index + i * TEXTURE_SIZE
+        materials.append(_string(data, record + struct.unpack_from('<i', data, record)[0]))
+
+    cd_count, cd_index = _count_index(data, TEXTURES_OFFSET + 8)
+    cdmaterials = [_string(data, struct.unpack_from('<i', data, cd_index + i * 4)[0]) for i in range(cd_count)]
+
+    # mstudiomodelgroup_t: label index, name index (both relative to the record)
+    include_count, include_index = _count_index(data, INCLUDE_MODELS_OFFSET)
+    include_models = []
+    for i in range(include_count):
+        record = include_index + i * 8
+        include_models.append(_string(data, record + struct.unpack_from('<i', data, record + 4)[0]))
+
+    return MDLInfo(name, version, checksum, bones, materials, cdmaterials, sequence_count, include_models)
+
+def main():
+    """python mdl.py <file.mdl>..."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='+')
+    args = parser.parse_args()
+    for path in args.files:
+        info = read_mdl(path)
+        print(f"{path}: {info.describe()}")
+        print(f"  bones: {', '.join(name for name, _ in info.bones)}")
+        print(f"  materials: {', '.join(info.materials)}")
+        print(f"  cdmaterials: {', '.join(info.cdmaterials)}")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"[mdl] ERROR: {e}")
+        sys.exit(1)
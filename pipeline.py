@@ -0,0 +1,137 @@
+"""
+skin2momentum
+pipeline - stage graph: declared dependencies, concurrent execution, per-run results
+"""
+
+import time
+import asyncio
+import inspect
+from tool_runner import run_fail_fast
+from events import get_logger, emit, enter_stage
+
+logger = get_logger('pipeline')
+
+class Node:
+    """One stage: func(*dependency results) -> result (False means failed)"""
+
+    def __init__(self, name, func, deps=(), after=(), title=None, critical=False, enabled=True, default=None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        # Ordering only: waited for, but their results and failures do not matter
+        self.after = tuple(after)
+        self.title = title or name
+        # A failed critical node fails the run
+        self.critical = critical
+        # Disabled nodes are not run, dependents get default
+        self.enabled = enabled
+        self.default = default
+
+class Pipeline:
+    """Runs each node once, as soon as its dependencies are done.
+
+    Async nodes run on the event loop, sync nodes in worker threads. A node whose
+    dependency failed is skipped. An exception cancels everything still running.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.results = {}
+        self.status = {}
+
+    def add(self, name, func, deps=(), after=(), **options):
+        for dep in (*deps, *after):
+            if dep not in self.nodes:
+                raise ValueError(f"[pipeline] {name} depends on unknown stage {dep}")
+        self.nodes[name] = Node(name, func, deps, after, **options)
+
+    def select(self, targets=None, seed=()):
+        """Nodes needed for targets (default: all), not walking past seeded results"""
+        if targets is None:
+            return [node for node in self.nodes.values() if node.name not in seed]
+        needed = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name in needed or name in seed:
+                continue
+            needed.add(name)
+            stack.extend(self.nodes[name].deps + self.nodes[name].after)
+        # Insertion order is a topological order
+        return [node for node in self.nodes.values() if node.name in needed]
+
+    def levels(self, nodes=None):
+        """Nodes grouped by dependency depth (each level can run concurrently)"""
+        nodes = [node for node in (nodes or self.nodes.values()) if node.enabled]
+        depth = {}
+        for node in nodes:
+            depth[node.name] = 1 + max((depth.get(dep, 0) for dep in node.deps + node.after), default=0)
+        levels = {}
+        for node in nodes:
+            levels.setdefault(depth[node.name], []).append(node)
+        return [levels[level] for level in sorted(levels)]
+
+    def describe(self, targets=None):
+        """Plan as text lines"""
+        lines = []
+        for level, nodes in enumerate(self.levels(self.select(targets)), 1):
+            lines.append(f"Level {level}: {', '.join(node.name for node in nodes)}")
+            for node in nodes:
+                deps = [dep for dep in node.deps + node.after if self.nodes[dep].enabled]
+                after = f" (after {', '.join(deps)})" if deps else ""
+                lines.append(f"    {node.name}: {node.title}{after}")
+        skipped = [node.name for node in self.nodes.values() if not node.enabled]
+        if skipped:
+            lines.append(f"Disabled: {', '.join(skipped)}")
+        return lines
+
+    async def run(self, targets=None, seed=None):
+        """Run targets (default: every node) and their dependencies, True if all critical nodes succeeded"""
+        seed = seed or {}
+        self.results = dict(seed)
+        self.status = {name: 'ok' for name in seed}
+        nodes = self.select(targets, seed)
+
+        if not nodes:
+            return True
+        tasks = {}
+        for node in nodes:
+            tasks[node.name] = asyncio.create_task(self._execute(node, tasks))
+        await run_fail_fast(list(tasks.values()))
+        return all(self.status.get(node.name) == 'ok' for node in nodes if node.critical and node.enabled)
+
+    async def _execute(self, node, tasks):
+        for dep in node.after:
+            if dep in tasks:
+                await tasks[dep]
+        values = []
+        for dep in node.deps:
+            if dep in tasks:
+                await tasks[dep]
+            if self.status.get(dep) != 'ok':
+                if node.enabled:
+                    logger.warning(f"[pipeline] Skipping {node.name}: {dep} did not succeed")
+                    emit('stage_finished', node.name, node.title, status='skipped', seconds=0.0)
+                self.status[node.name] = 'skipped'
+                return None
+            values.append(self.results[dep])
+
+        if not node.enabled:
+            result = node.default
+        else:
+            # Each node runs in its own task, the stage tag stays local to it
+            enter_stage(node.name)
+            logger.info(f"\n[main] {node.title}")
+            emit('stage_started', node.name, node.title)
+            start = time.perf_counter()
+            if inspect.iscoroutinefunction(node.func):
+                result = await node.func(*values)
+            else:
+                result = await asyncio.to_thread(node.func, *values)
+            if result is False:
+                logger.error(f"[main] {node.title}: failed")
+            emit('stage_finished', node.name, node.title, status='failed' if result is False else 'ok',
+                 seconds=round(time.perf_counter() - start, 3))
+        self.results[node.name] = result
+        self.status[node.name] = 'failed' if result is False else 'ok'
+        return result
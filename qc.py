@@ -0,0 +1,57 @@
+"""
+skin2momentum
+qc - QC tokenizer and reference extraction
+"""
+
+import re
+from pathlib import Path
+
+# Quoted string, brace, or bare word (comments stripped first)
+TOKEN_RE = re.compile(r'"([^"]*)"|([{}])|([^\s"{}]+)')
+COMMENT_RE = re.compile(r'//[^\n]*|/\*.*?\*/', re.DOTALL)
+
+def tokenize_qc(text):
+    """[(token, quoted)]"""
+    tokens = []
+    for match in TOKEN_RE.finditer(COMMENT_RE.sub(' ', text)):
+        quoted, brace, word = match.groups()
+        if quoted is not None:
+            tokens.append((quoted, True))
+        else:
+            tokens.append((brace or word, False))
+    return tokens
+
+def commands(text, names):
+    """Token lists of each top-level $command in names (including its { } block)"""
+    names = {name.lower() for name in names}
+    result = []
+    current = None
+    depth = 0
+    for token, quoted in tokenize_qc(text):
+        if not quoted and depth == 0 and token.startswith('$'):
+            current = [] if token.lower() in names else None
+            if current is not None:
+                result.append((token.lower(), current))
+            continue
+        if not quoted and token == '{':
+            depth += 1
+        elif not quoted and token == '}':
+            depth = max(0, depth - 1)
+        if current is not None:
+            current.append(token)
+    return result
+
+def referenced_animation_files(qc_path, anim_dir):
+    """Files in anim_dir used by $sequence/$animation in the QC (by name, with or without .smd)"""
+    anim_dir = Path(anim_dir)
+    available = {f.name.lower(): f for f in anim_dir.glob("*.smd")}
+    available.update({f.stem.lower(): f for f in anim_dir.glob("*.smd")})
+
+    text = Path(qc_path).read_text(encoding='utf-8', errors='ignore')
+    referenced = set()
+    for _, tokens in commands(text, ('$sequence', '$animation')):
+        for token in tokens:
+            name = token.replace('\\', '/').rpartition('/')[2].lower()
+            if name in available:
+                referenced.add(available[name])
+    return referenced
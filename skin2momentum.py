@@ -5,12 +5,35 @@ skin2momentum
 import os
 import sys
 import re
-import shutil
-import subprocess
 import tempfile
 import argparse
+import asyncio
+import threading
+from functools import partial
 from pathlib import Path
-from vmt_fixer import find_materials_from_smd, process_materials, get_cdmaterials_paths
+from vmt_fixer import find_materials_from_smd, process_materials, get_cdmaterials_paths, directory_cache, texture_references
+from material_index import MaterialIndex
+from keyvalues import keyvalues_cache
+from decompile_cache import DecompileCache, DEFAULT_MAX_BYTES, default_cache_root, tool_version, model_files
+from build_manifest import BuildManifest
+from tool_runner import ToolError, run_process, run_tool, CROWBAR_PATTERNS
+from instrumentation import Tracer, traced, annotate
+from staging import Stager, remove_file
+from vpk import VPKWriter
+from vtf import copy_textures
+from qc import referenced_animation_files, tokenize_qc
+from content_store import ContentStore
+from compile_pool import CompilePool, compile_timeout, COMPILE_TIMEOUT_BASE
+from pipeline import Pipeline
+from events import get_logger, log_to_console
+
+logger = get_logger('skin2momentum')
+
+DECOMPILE_TIMEOUT = 30
+MAX_PRINTED_WARNINGS = 20
+MODEL_SUFFIXES = ('.mdl', '.vvd', '.vtx', '.phy')
+# $lod switch point step (LOD n switches at n * step)
+LOD_SWITCH_STEP = 10
 
 class Converter:
 
@@ -33,11 +56,75 @@ class Converter:
         
         self.crowbar = Path(__file__).parent / "thirdparty" / "CrowbarDecompiler(1.1).exe"
         self.studiomdl = self.game_dir / "bin" / "win64" / "studiomdl.exe"
+        if getattr(args, 'crowbar', None):
+            self.crowbar = Path(args.crowbar).resolve()
+        if getattr(args, 'studiomdl', None):
+            self.studiomdl = Path(args.studiomdl).resolve()
         self.gameinfo = self.game_dir / "momentum" / "gameinfo.txt"
         self.weapon_model = self.data_dir / args.weapon
         self.weapon_anim = self.data_dir / args.weapon.replace('.mdl', '_anim.mdl')
         self.glove_model = self.data_dir / args.gloves
 
+        # Batch mode: temp work root per job
+        self.work_dir = Path(args.work).resolve() if getattr(args, 'work', None) else None
+
+        # Decompile cache
+        self.cache = None
+        if not getattr(args, 'no_cache', False):
+            cache_dir = getattr(args, 'cache_dir', None) or default_cache_root() / "decompile"
+            cache_size = getattr(args, 'cache_size', None)
+            max_bytes = cache_size * 1024 ** 2 if cache_size else DEFAULT_MAX_BYTES
+            self.cache = DecompileCache(Path(cache_dir).resolve(), max_bytes)
+
+        self._material_index = None
+        self._index_lock = threading.Lock()
+
+        # Reflink/hardlink/copy into the output tree
+        self.stager = Stager()
+        self.store = ContentStore(Path(args.store).resolve()) if getattr(args, 'store', None) else None
+
+        # Textures referenced by the fixed VMTs
+        self.copy_vtfs = not getattr(args, 'no_textures', False)
+        self.max_texture_size = getattr(args, 'max_texture_size', None)
+
+        # Optional VPK of the runtime files (model, scripts, materials)
+        self.vpk_path = Path(args.vpk).resolve() if getattr(args, 'vpk', None) else None
+        self.vpk_version = getattr(args, 'vpk_version', None) or 1
+
+        # studiomdl runs in reused game dirs, at most compile_workers at once (shared by batch jobs)
+        compile_dir = getattr(args, 'compile_dir', None)
+        self.compile_pool = CompilePool(Path(compile_dir).resolve() if compile_dir else default_cache_root() / "compile",
+                                        self.gameinfo, getattr(args, 'compile_workers', None))
+        self.compile_timeout = getattr(args, 'compile_timeout', None) or COMPILE_TIMEOUT_BASE
+
+        # Per-stage metrics, written with --trace
+        self.tracer = Tracer()
+        self.trace_path = Path(args.trace).resolve() if getattr(args, 'trace', None) else None
+
+        # Geometry pass over the SMDs (numpy): fitted $bbox/$cbox, unweighted $definebone removal
+        self.fit_bbox = getattr(args, 'fit_bbox', False)
+        self.prune_bones = getattr(args, 'prune_bones', False)
+        # smd/lod (numpy) and watcher are imported only by runs that use them
+        if self.fit_bbox or self.prune_bones:
+            from smd import require_numpy
+            require_numpy("--fit-bbox/--prune-bones")
+        # Simplified weapon/glove SMDs per ratio, as $lod blocks
+        self.lod_ratios = getattr(args, 'lods', None) or []
+        self.lod_switch = getattr(args, 'lod_switch', None) or LOD_SWITCH_STEP
+        if self.lod_ratios:
+            from smd import require_numpy
+            require_numpy("--lods")
+
+        # Full Crowbar/studiomdl output, matched errors/warnings per step
+        self.log_dir = Path(args.output).resolve() / "logs"
+        self.diagnostics = {}
+        # Materials the SMDs use (set by the materials stage)
+        self.materials = []
+
+        # Incremental builds (stages skipped when inputs match the last run)
+        self.manifest = BuildManifest(self.output_dir / f"{self.model_name}.build.json",
+                                      force=getattr(args, 'force', False))
+
         required_paths = [
             (self.data_dir, "Data"),
             (self.game_dir, "Game"),
@@ -53,42 +140,129 @@ class Converter:
                 raise ValueError(f"{description} not found: {path}")
         
 
+    @traced('decompile_model')
     def decompile_model(self, model_path, output_dir):
         """Decompile mdl"""
         if not model_path.exists():
-            print(f"[decompile_model] Model not found: {model_path}")
+            logger.error(f"[decompile_model] Model not found: {model_path}")
             return None
         
         output_dir.mkdir(parents=True, exist_ok=True)
-        cmd = [str(self.crowbar), str(model_path), str(output_dir)]
+        cache_key, smd_path = self.restore_decompiled(model_path, output_dir)
+        if smd_path:
+            return smd_path
+
+        if not self.run_decompiler(model_path, output_dir):
+            return None
+        return self.store_decompiled(cache_key, model_path, output_dir)
+
+    @traced('decompile_model')
+    async def decompile_model_async(self, model_path, output_dir):
+        """Decompile mdl without blocking the event loop (raises ToolError)"""
+        if not model_path.exists():
+            raise ToolError(f"Model not found: {model_path}")
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+        cache_key, smd_path = await asyncio.to_thread(self.restore_decompiled, model_path, output_dir)
+        if smd_path:
+            return smd_path
+
+        result = await run_process(self.decompile_cmd(model_path, output_dir), DECOMPILE_TIMEOUT,
+                                   log_path=self.tool_log('decompile', model_path), patterns=CROWBAR_PATTERNS)
+        self.record_diagnostics(f"decompile:{model_path.name}", result)
+        if result.fatal:
+            raise ToolError(f"Crowbar failed on {model_path.name}: {result.fatal.message} (log: {result.log_path})")
+        if result.returncode != 0:
+            raise ToolError(f"Crowbar exited with {result.returncode}: {model_path.name} (log: {result.log_path})")
+        smd_path = await asyncio.to_thread(self.store_decompiled, cache_key, model_path, output_dir)
+        if not smd_path:
+            raise ToolError(f"No SMD decompiled from {model_path.name}")
+        return smd_path
+
+    def restore_decompiled(self, model_path, output_dir):
+        """(cache key, SMD) - SMD is None on a cache miss"""
+        if not self.cache:
+            return None, None
+        cache_key = self.cache.key(model_path, tool_version(self.crowbar))
+        if self.cache.restore(cache_key, output_dir):
+            logger.info(f"[decompile_model] Cache hit: {model_path.name}")
+            annotate(cache_hit=True, files=count_files(output_dir))
+            return cache_key, self.find_smd(output_dir)
+        return cache_key, None
+
+    def store_decompiled(self, cache_key, model_path, output_dir):
+        """Find the decompiled SMD and cache the tree"""
+        smd_path = self.find_smd(output_dir)
+        annotate(cache_hit=False, files=count_files(output_dir))
+        if smd_path and self.cache:
+            self.cache.store(cache_key, output_dir, model_path.name)
+        return smd_path
+
+    def decompile_cmd(self, model_path, output_dir):
+        """Crowbar command line"""
+        return [str(self.crowbar), str(model_path), str(output_dir)]
+
+    def run_decompiler(self, model_path, output_dir):
+        """Run Crowbar"""
+        cmd = self.decompile_cmd(model_path, output_dir)
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            if result.returncode == 0:
-                for root, dirs, files in os.walk(output_dir):
-                    for file in files:
-                        if file.endswith('.smd'):
-                            smd_path = Path(root) / file
-                            print(f"[decompile_model] Found SMD: {smd_path.name}")
-                            return smd_path
+            result = run_tool(cmd, DECOMPILE_TIMEOUT, self.tool_log('decompile', model_path), CROWBAR_PATTERNS)
+            self.record_diagnostics(f"decompile:{model_path.name}", result)
+            if result.fatal:
+                logger.error(f"[decompile_model] {result.fatal.message} (log: {result.log_path})")
+            return result.ok
         except Exception as e:
-            print(f"[decompile_model] Failed: {e}")
+            logger.error(f"[decompile_model] Failed: {e}")
+        return False
+
+    def tool_log(self, tool, path):
+        """Full tool output goes to <output>/logs/<tool>_<name>.log"""
+        return self.log_dir / f"{tool}_{Path(path).stem}.log"
+
+    def record_diagnostics(self, step, result):
+        """Keep matched errors/warnings for the run summary"""
+        if result.diagnostics:
+            self.diagnostics[step] = [d._asdict() for d in result.diagnostics]
+
+    def find_smd(self, output_dir):
+        """First SMD in decompile output"""
+        for root, dirs, files in os.walk(output_dir):
+            for file in files:
+                if file.endswith('.smd'):
+                    smd_path = Path(root) / file
+                    logger.info(f"[decompile_model] Found SMD: {smd_path.name}")
+                    return smd_path
         return None
-    
 
-    def copy_animations(self, anim_model, temp_dir, output_dir):
-        """Copy animations"""
+    def material_index(self):
+        """Index of the source materials tree (scanned once per run)"""
+        with self._index_lock:
+            if self._material_index is None:
+                self._material_index = MaterialIndex.load(self.data_dir / "materials")
+        return self._material_index
 
-        if not anim_model.exists():
-            alt_anim_model = anim_model.parent / anim_model.name.replace('_anim.mdl', '.mdl')
-            if alt_anim_model.exists():
-                anim_model = alt_anim_model
-                print(f"[copy_animations] Animation model found: {anim_model.name}")
-            else:
-                print(f"[copy_animations] No animation model found: {anim_model.name} or {alt_anim_model.name}")
-                return None, None, None
+    def resolve_anim_model(self, anim_model):
+        """<weapon>_anim.mdl, else the weapon model itself"""
+        if anim_model.exists():
+            return anim_model
+        alt_anim_model = anim_model.parent / anim_model.name.replace('_anim.mdl', '.mdl')
+        if alt_anim_model.exists():
+            logger.info(f"[copy_animations] Animation model found: {alt_anim_model.name}")
+            return alt_anim_model
+        logger.warning(f"[copy_animations] No animation model found: {anim_model.name} or {alt_anim_model.name}")
+        return None
+
+    @traced('copy_animations')
+    def copy_animations(self, anim_model, temp_dir, output_dir, anim_smd=None):
+        """Copy animations (anim_smd: already decompiled into temp_dir/anim)"""
+
+        anim_model = self.resolve_anim_model(anim_model)
+        if not anim_model:
+            return None, None, None
         
         anim_dir = temp_dir / "anim"
-        anim_smd = self.decompile_model(anim_model, anim_dir)
+        if anim_smd is None:
+            anim_smd = self.decompile_model(anim_model, anim_dir)
 
         if not anim_smd:
             return None, None, None
@@ -108,14 +282,42 @@ class Converter:
         anim_output_dir = output_dir / f"{self.model_name}_anims"
         anim_output_dir.mkdir(parents=True, exist_ok=True)
         
-        for anim_file in anim_smd_dir.glob("*.smd"):
+        # Only the SMDs the animation QC actually uses
+        anim_files = sorted(anim_smd_dir.glob("*.smd"))
+        referenced = referenced_animation_files(anim_qc, anim_smd_dir)
+        if referenced:
+            unused = len(anim_files) - len(referenced)
+            anim_files = [f for f in anim_files if f in referenced]
+            if unused:
+                logger.info(f"[copy_animations] Skipping {unused} animations the QC does not reference")
+
+        inputs = self.manifest.fingerprint(anim_files)
+        if self.manifest.up_to_date('animations', inputs):
+            logger.info(f"[copy_animations] Up to date: {len(anim_files)} animations")
+            return str(anim_qc), str(anim_output_dir), str(anim_model)
+
+        # Drop animations left over from an earlier run
+        keep = {f.name for f in anim_files}
+        for stale in anim_output_dir.glob("*.smd"):
+            if stale.name not in keep:
+                remove_file(stale)
+
+        for anim_file in anim_files:
             dst = anim_output_dir / anim_file.name
-            shutil.copy2(anim_file, dst)
-            print(f"[copy_animations] Copied: {anim_file.name}")
+            if self.store:
+                # Byte-identical animations (across jobs too) share one stored copy
+                self.store.link(anim_file, dst, self.stager)
+            else:
+                self.stager.stage(anim_file, dst)
+            logger.info(f"[copy_animations] Copied: {anim_file.name}")
+        annotate(files=len(anim_files))
+        self.manifest.record('animations', inputs, [anim_output_dir / f.name for f in anim_files])
         
         return str(anim_qc), str(anim_output_dir), str(anim_model)
     
-    def generate_qc(self, weapon_qc_path, glove_qc_path, anim_qc_path, output_qc_path, materials_list, actual_anim_model):
+    @traced('generate_qc')
+    def generate_qc(self, weapon_qc_path, glove_qc_path, anim_qc_path, output_qc_path, materials_list, actual_anim_model,
+                    cdmaterials_paths=None):
         """Generate QC (bodygroup approach)"""
         
         with open(weapon_qc_path, 'r', encoding='utf-8') as f:
@@ -138,21 +340,43 @@ class Converter:
         qc_lines.append('}')
         qc_lines.append('')
         
+        if self.lod_ratios:
+            from lod import lod_path
+        for level in range(1, len(self.lod_ratios) + 1):
+            qc_lines.append(f'$lod {self.lod_switch * level}')
+            qc_lines.append('{')
+            for model in (self.weapon_model, self.glove_model):
+                smd_name = f"{Path(model).stem}.smd"
+                qc_lines.append(f'    replacemodel "{smd_name}" "{lod_path(smd_name, level).name}"')
+            qc_lines.append('}')
+            qc_lines.append('')
+
         qc_lines.append('$surfaceprop "weapon"')
         qc_lines.append('$contents "solid"')
         qc_lines.append('$illumposition 0 0 0')
         
         # Generate $cdmaterials paths automatically
-        source_materials_dir = self.data_dir / "materials"
-        cdmaterials_paths = get_cdmaterials_paths(source_materials_dir, materials_list)
+        if cdmaterials_paths is None:
+            cdmaterials_paths = self.cdmaterials_paths(materials_list)
         for path in cdmaterials_paths:
             qc_lines.append(f'$cdmaterials {path}')
         qc_lines.append('')
         
         # Use only knife bone definitions (with bonemerge and bonesaveframe)
         weapon_lines = weapon_qc_content.split('\n')
+        bounds, keep_bones = self.analyze_smds(weapon_lines)
+        pruned = []
         for line in weapon_lines:
             line = line.strip()
+            if bounds is not None and line.startswith(('$bbox', '$cbox')):
+                mins, maxs = bounds
+                qc_lines.append(f"{line.split()[0]} " + ' '.join(f"{v:.3f}" for v in (*mins, *maxs)))
+                continue
+            if keep_bones is not None and line.startswith('$definebone'):
+                tokens = tokenize_qc(line)
+                if len(tokens) > 1 and tokens[1][0] not in keep_bones:
+                    pruned.append(tokens[1][0])
+                    continue
             if (line.startswith('$definebone') or
                 line.startswith('$attachment') or
                 line.startswith('$bbox') or
@@ -160,6 +384,8 @@ class Converter:
                 line.startswith('$bonemerge') or
                 line.startswith('$bonesaveframe')):
                 qc_lines.append(line)
+        if pruned:
+            logger.info(f"[generate_qc] Pruned {len(pruned)} unweighted bones: {', '.join(pruned)}")
         
         qc_lines.append('')
         
@@ -168,61 +394,121 @@ class Converter:
             anim_model_name = Path(actual_anim_model).stem
             qc_lines.append(f'$includemodel "weapons/{anim_model_name}.mdl"')
         
-        with open(output_qc_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(qc_lines))
-        
-        print(f"[generate_qc] QC generated: {output_qc_path}")
+        # Leave an identical QC untouched
+        qc_text = '\n'.join(qc_lines)
+        output_qc_path = Path(output_qc_path)
+        if output_qc_path.exists() and output_qc_path.read_text(encoding='utf-8') == qc_text:
+            logger.info(f"[generate_qc] QC unchanged: {output_qc_path}")
+        else:
+            with open(output_qc_path, 'w', encoding='utf-8') as f:
+                f.write(qc_text)
+            annotate(files=1)
+            logger.info(f"[generate_qc] QC generated: {output_qc_path}")
         if actual_anim_model:
-            print(f"[generate_qc] Using animation model: {Path(actual_anim_model).name}")
+            logger.info(f"[generate_qc] Using animation model: {Path(actual_anim_model).name}")
     
-    def compile_model(self, qc_path, work_dir):
-        """Compile model"""
+    @traced('generate_lods')
+    def generate_lods(self, smd_files):
+        """LOD SMDs for the weapon and gloves"""
+        inputs = self.manifest.fingerprint(smd_files, ','.join(str(ratio) for ratio in self.lod_ratios))
+        if self.manifest.up_to_date('lods', inputs):
+            logger.info(f"[generate_lods] Up to date: {len(self.manifest.outputs('lods'))} LODs")
+            return True
+        from lod import generate_lods
         try:
-            temp_game_dir = work_dir / "temp_game"
-            temp_game_dir.mkdir(exist_ok=True)
-            
-            gameinfo_dest = temp_game_dir / "gameinfo.txt"
-            shutil.copy2(self.gameinfo, gameinfo_dest)
-            
-            cmd = [
-                str(self.studiomdl),
-                "-verbose",
-                "-game", str(temp_game_dir),
-                "-nop4",
-                str(qc_path)
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60, cwd=str(work_dir))
-            
-            print(f"[compile_model] Return code: {result.returncode}")
-            if result.stdout:
-                print(f"[compile_model] Compilation output: {result.stdout[-1000:]}")
-            
-            if result.returncode == 0:
-                qc_name = Path(qc_path).stem
-                models_dir = temp_game_dir / "models" / "weapons"
-                
-                if models_dir.exists():
-                    moved_count = 0
-                    for file in models_dir.iterdir():
-                        if file.stem.startswith(qc_name):
-                            dst = work_dir / file.name
-                            shutil.move(str(file), str(dst))
-                            size = dst.stat().st_size
-                            print(f"[compile_model] Created: {file.name} ({size:,} bytes)")
-                            moved_count += 1
-                    
-                    shutil.rmtree(temp_game_dir, ignore_errors=True)
-                    return moved_count >= 3
-            else:
-                if result.stderr:
-                    print(f"[compile_model] Compilation error: {result.stderr}")
-            
+            outputs = []
+            for smd_file in smd_files:
+                for path, before, after in generate_lods(smd_file, self.lod_ratios):
+                    logger.info(f"[generate_lods] {path.name}: {before:,} -> {after:,} triangles")
+                    annotate(triangles_before=before, triangles_after=after)
+                    outputs.append(path)
+            annotate(files=len(outputs))
+            self.manifest.record('lods', inputs, outputs)
+            return True
+        except Exception as e:
+            logger.error(f"[generate_lods] Failed: {e}")
+            return False
+
+    def analyze_smds(self, weapon_qc_lines):
+        """(combined weapon+glove bounds, bones to keep) - None for options that are off"""
+        if not (self.fit_bbox or self.prune_bones):
+            return None, None
+        from smd import load_smd, combined_bounds, required_bones
+        smds = [load_smd(self.output_dir / f"{Path(model).stem}.smd") for model in (self.weapon_model, self.glove_model)]
+
+        bounds = combined_bounds(smds) if self.fit_bbox else None
+        if bounds is not None:
+            logger.info(f"[generate_qc] Fitted bbox: {' '.join(f'{v:.3f}' for v in (*bounds[0], *bounds[1]))}")
+
+        keep_bones = None
+        if self.prune_bones:
+            # Bones named by attachments/bonemerge stay even without weights
+            named, definebone_parents = set(), {}
+            for line in weapon_qc_lines:
+                tokens = [token for token, _ in tokenize_qc(line)]
+                if len(tokens) < 2:
+                    continue
+                command = tokens[0].lower()
+                if command == '$attachment' and len(tokens) > 2:
+                    named.add(tokens[2])
+                elif command in ('$bonemerge', '$bonesaveframe'):
+                    named.add(tokens[1])
+                elif command == '$definebone' and len(tokens) > 2:
+                    definebone_parents[tokens[1]] = tokens[2]
+
+            keep_bones = required_bones(smds, named)
+            for name in list(keep_bones):
+                parent = definebone_parents.get(name)
+                while parent and parent not in keep_bones:
+                    keep_bones.add(parent)
+                    parent = definebone_parents.get(parent)
+            unweighted = [name for name in definebone_parents if name not in keep_bones]
+            annotate(bones=len(definebone_parents), unweighted_bones=len(unweighted))
+        return bounds, keep_bones
+
+    @traced('compile_model')
+    def compile_model(self, qc_path, work_dir, smd_files=()):
+        """Compile model in a free compile slot"""
+        try:
+            timeout = compile_timeout(smd_files, base=self.compile_timeout)
+            log_path = self.tool_log('compile', qc_path)
+            with self.compile_pool.compile(self.studiomdl, qc_path, work_dir, timeout, log_path) as (result, temp_game_dir):
+                self.record_diagnostics('compile', result)
+                logger.info(f"[compile_model] Return code: {result.returncode}, log: {result.log_path}")
+                for warning in result.warnings[:MAX_PRINTED_WARNINGS]:
+                    logger.warning(f"[compile_model] Warning (line {warning.line}): {warning.message}")
+                if len(result.warnings) > MAX_PRINTED_WARNINGS:
+                    logger.info(f"[compile_model] ... {len(result.warnings) - MAX_PRINTED_WARNINGS} more warnings in the log")
+
+                if result.ok:
+                    qc_name = Path(qc_path).stem
+                    models_dir = temp_game_dir / "models" / "weapons"
+
+                    if models_dir.exists():
+                        moved_count = 0
+                        for file in models_dir.iterdir():
+                            if file.stem.startswith(qc_name):
+                                dst = work_dir / file.name
+                                self.stager.move(file, dst)
+                                size = dst.stat().st_size
+                                logger.info(f"[compile_model] Created: {file.name} ({size:,} bytes)")
+                                moved_count += 1
+                        annotate(files=moved_count)
+                        return moved_count >= 3
+                elif result.fatal:
+                    logger.error(f"[compile_model] Compilation error (line {result.fatal.line}, aborted): {result.fatal.message}")
+
             return False
         except Exception as e:
-            print(f"[compile_model] Compilation error: {e}")
+            logger.error(f"[compile_model] Compilation error: {e}")
             return False
-    
+
+    def compiled_files(self):
+        """Compiled model files in the output dir"""
+        return sorted(f for f in self.output_dir.glob(f"{self.model_name}.*")
+                      if f.suffix in ('.mdl', '.vvd', '.vtx', '.phy'))
+
+    @traced('copy_scripts')
     def copy_scripts(self):
         """Copy weapon scripts based on type"""
         try:
@@ -236,44 +522,32 @@ class Converter:
                 source_script = self.scripts_dir / "weapon_momentum_pistol.txt"
                 target_script = scripts_output_dir / "weapon_momentum_pistol.txt"
             else:
-                print(f"[copy_scripts] Unknown weapon type: {self.weapon_type}")
+                logger.warning(f"[copy_scripts] Unknown weapon type: {self.weapon_type}")
                 return False
             
-            shutil.copy2(source_script, target_script)
+            inputs = self.manifest.fingerprint(source_script)
+            if self.manifest.up_to_date('scripts', inputs):
+                logger.info(f"[copy_scripts] Up to date: {target_script.name}")
+                return True
+
+            # Never hardlink: the output copy must not alias the repo's script
+            self.stager.stage(source_script, target_script, hardlink=False)
+            annotate(files=1)
+            self.manifest.record('scripts', inputs, [target_script])
             
-            print(f"[copy_scripts] Copied: {source_script.name} -> {target_script.name}")
+            logger.info(f"[copy_scripts] Copied: {source_script.name} -> {target_script.name}")
             return True
             
         except Exception as e:
-            print(f"[copy_scripts] Error: {e}")
+            logger.error(f"[copy_scripts] Error: {e}")
             return False
     
-    def fix_vmts(self):
+    @traced('fix_vmts')
+    def fix_vmts(self, unique_materials):
         """Fix VMT files"""
         try:
-            # Find materials from SMD files in our output
-            all_materials = []
-            
-            # Weapon SMD
-            weapon_smd = self.output_dir / f"{Path(self.weapon_model).stem}.smd"
-            if weapon_smd.exists():
-                materials = find_materials_from_smd(weapon_smd)
-                all_materials.extend(materials)
-                print(f"[fix_vmts] Materials from weapon: {materials}")
-            
-            # Glove SMD
-            glove_smd = self.output_dir / f"{Path(self.glove_model).stem}.smd"
-            if glove_smd.exists():
-                materials = find_materials_from_smd(glove_smd)
-                all_materials.extend(materials)
-                print(f"[fix_vmts] Materials from gloves: {materials}")
-            
-            # Remove duplicates
-            unique_materials = list(set(all_materials))
-            print(f"[fix_vmts] Unique materials found: {unique_materials}")
-            
             if not unique_materials:
-                print("[fix_vmts] No materials found")
+                logger.warning("[fix_vmts] No materials found")
                 return True
             
             # Source materials
@@ -282,88 +556,366 @@ class Converter:
             # Target materials
             target_materials_dir = Path(self.output_dir).parent.parent / "materials"
             
+            # Inputs: material names, their source VMTs and the textures next to them
+            index = self.material_index()
+            unique_materials = sorted(unique_materials)
+            sources = [vmt for material in unique_materials for vmt in index.find_vmts(material)]
+            folders = sorted({vmt.parent for vmt in sources})
+            inputs = self.manifest.fingerprint(unique_materials, sources,
+                                               [sorted(index.listing(folder)) for folder in folders])
+            if self.manifest.up_to_date('vmts', inputs):
+                logger.info(f"[fix_vmts] Up to date: {len(unique_materials)} materials")
+                return True
+
             # Process using material_fixer
-            process_materials(source_materials_dir, target_materials_dir, unique_materials)
-            
-            print(f"[fix_vmts] Processed {len(unique_materials)} materials")
+            written = process_materials(source_materials_dir, target_materials_dir, unique_materials, index,
+                                        self.store, self.stager)
+            self.manifest.record('vmts', inputs, written)
+            annotate(files=len(written))
+            
+            logger.info(f"[fix_vmts] Processed {len(unique_materials)} materials")
+            stats = directory_cache.stats()
+            logger.info(f"[fix_vmts] Directory cache: {stats['hits']} hits, {stats['misses']} misses, {stats['indexed']} from index")
+            stats = keyvalues_cache.stats()
+            logger.info(f"[fix_vmts] Parse cache: {stats['hits']} hits, {stats['misses']} parsed")
             return True
             
         except Exception as e:
-            print(f"[fix_vmts] Error: {e}")
+            logger.error(f"[fix_vmts] Error: {e}")
             return False
     
-    def main(self):
-        """Run conversion"""
+    @traced('copy_smds')
+    def copy_smds(self, weapon_smd, glove_smd):
+        """Copy SMDs (no merging)"""
+        weapon_output = self.output_dir / f"{Path(self.weapon_model).stem}.smd"
+        glove_output = self.output_dir / f"{Path(self.glove_model).stem}.smd"
         
-        self.output_dir.mkdir(parents=True, exist_ok=True)
+        inputs = self.manifest.fingerprint(weapon_smd, glove_smd)
+        if self.manifest.up_to_date('smds', inputs):
+            logger.info(f"[main] Up to date: {weapon_output.name}, {glove_output.name}")
+        else:
+            # Decompile output is private to this run, link it into place
+            self.stager.stage(weapon_smd, weapon_output)
+            self.stager.stage(glove_smd, glove_output)
+            self.manifest.record('smds', inputs, [weapon_output, glove_output])
+            
+            annotate(files=2)
+            logger.info(f"[main] Copied: {weapon_smd.name} -> {weapon_output.name}")
+            logger.info(f"[main] Copied: {glove_smd.name} -> {glove_output.name}")
         
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_path = Path(temp_dir)
-            
-            # Decompile both models (separately)
-            print("[main] 1. Decompiling models")
-            weapon_dir = temp_path / "knife"
-            glove_dir = temp_path / "glove"
-            
-            weapon_smd = self.decompile_model(self.weapon_model, weapon_dir)
-            glove_smd = self.decompile_model(self.glove_model, glove_dir)
-            
-            if not weapon_smd or not glove_smd:
+        return [weapon_output, glove_output]
+
+    @traced('find_materials')
+    def find_materials(self, smd_files):
+        """Materials the SMDs use (scanned once per run, shared by QC and VMT stages)"""
+        unique_materials = sorted({material for smd in smd_files for material in find_materials_from_smd(smd)})
+        self.materials = unique_materials
+        logger.info(f"[main] Materials found: {unique_materials}")
+        return unique_materials
+
+    def cdmaterials_paths(self, materials_list):
+        """$cdmaterials lines for the materials"""
+        return get_cdmaterials_paths(self.data_dir / "materials", materials_list, self.material_index())
+
+    @traced('copy_textures')
+    def copy_textures(self):
+        """Copy the VTFs the fixed VMTs reference (top mips dropped above --max-texture-size)"""
+        try:
+            index = self.material_index()
+            textures_dir = self.output_dir.parent.parent / "materials"
+            pairs = {}
+            for vmt in self.manifest.outputs('vmts'):
+                for texture in texture_references(vmt.read_text(encoding='utf-8')):
+                    src = index.resolve(f"{texture}.vtf")
+                    if src:
+                        pairs[textures_dir / src.relative_to(index.root)] = src
+                    else:
+                        logger.warning(f"[copy_textures] Texture not found: {texture}")
+
+            pairs = sorted((src, dst) for dst, src in pairs.items())
+            inputs = self.manifest.fingerprint([src for src, _ in pairs], str(self.max_texture_size))
+            if self.manifest.up_to_date('textures', inputs):
+                logger.info(f"[copy_textures] Up to date: {len(pairs)} textures")
+                return True
+
+            written = copy_textures(pairs, self.max_texture_size, store=self.store, stager=self.stager)
+            self.manifest.record('textures', inputs, written)
+            annotate(files=len(written))
+            return len(written) == len(pairs)
+        except Exception as e:
+            logger.error(f"[copy_textures] Error: {e}")
+            return False
+
+    @traced('package_vpk')
+    def package_vpk(self):
+        """Write the runtime outputs into a VPK (SMD/QC/anims stay in the build dir)"""
+        try:
+            output_root = self.output_dir.parent.parent
+            files = self.runtime_files()
+
+            with VPKWriter(self.vpk_path, self.vpk_version, split=self.vpk_path.name.endswith('_dir.vpk')) as writer:
+                for path in files:
+                    writer.add_file(path.relative_to(output_root).as_posix(), path)
+            annotate(files=len(files))
+            return True
+        except Exception as e:
+            logger.error(f"[package_vpk] Error: {e}")
+            return False
+
+    def runtime_files(self):
+        """Model, scripts, materials and textures the game loads"""
+        files = []
+        for stage in ('compile', 'scripts', 'vmts', 'textures'):
+            files.extend(self.manifest.outputs(stage))
+        return sorted({path.resolve() for path in files if path.is_file()})
+
+    def artifacts(self):
+        """Every file the last run produced or kept up to date (runtime files plus the VPK)"""
+        files = self.runtime_files()
+        if self.vpk_path and self.vpk_path.is_file():
+            files.append(self.vpk_path)
+        return files
+
+    def main(self):
+        """Run conversion (and write the trace)"""
+        try:
+            with self.tracer.stage('main', model=self.model_name):
+                return self.convert()
+        finally:
+            if self.trace_path:
+                self.tracer.save(self.trace_path)
+
+    def watch(self, debounce=None, polling=False):
+        """Convert, then reconvert whatever changes under -data until Ctrl+C"""
+        from watcher import create_watcher, changes, DEFAULT_DEBOUNCE
+        debounce = DEFAULT_DEBOUNCE if debounce is None else debounce
+        success = self.main()
+        watcher = create_watcher(self.data_dir, polling)
+        logger.info(f"\n[watch] Watching {self.data_dir} (Ctrl+C to stop)")
+        try:
+            for changed in changes(watcher, debounce):
+                stages = self.affected_stages(changed)
+                if not stages:
+                    continue
+                names = sorted(path.name for path in changed)
+                logger.info(f"\n[watch] Changed: {', '.join(names[:5])}{' ...' if len(names) > 5 else ''}")
+
+                # Keep the index unless files were added/removed
+                if self._material_index is not None and not self._material_index.is_fresh():
+                    self._material_index = None
+                    directory_cache.invalidate()
+
+                if 'convert' in stages:
+                    success = self.main()
+                else:
+                    success = self.rerun(stages)
+                logger.info(f"[watch] Result: {'SUCCESS' if success else 'FAILED'}")
+        except KeyboardInterrupt:
+            logger.info("\n[watch] Stopped")
+        finally:
+            watcher.close()
+        return success
+
+    def affected_stages(self, changed):
+        """{'convert'} for model edits, else the subset of {'vmts', 'textures'} to redo"""
+        model_stems = {self.weapon_model.stem.lower(), self.glove_model.stem.lower(), self.weapon_anim.stem.lower()}
+        materials_dir = self.data_dir / "materials"
+        stages = set()
+        for path in changed:
+            if path == self.data_dir:
+                # Watcher overflow: everything may have changed
+                return {'convert'}
+            suffix = path.suffix.lower()
+            if suffix in MODEL_SUFFIXES and path.name.split('.')[0].lower() in model_stems:
+                return {'convert'}
+            if path.is_relative_to(materials_dir):
+                if suffix == '.vmt':
+                    stages.update(('vmts', 'textures'))
+                elif suffix == '.vtf':
+                    stages.add('textures')
+        return stages
+
+    def rerun(self, stages):
+        """Redo only the material stages (the model itself is unchanged)"""
+        # Earlier results stand in for the stages that are not redone
+        seed = {
+            'smds': [self.output_dir / f"{Path(model).stem}.smd" for model in (self.weapon_model, self.glove_model)],
+            'compile': True,
+            'scripts': True,
+        }
+        if 'vmts' not in stages:
+            seed['vmts'] = True
+        targets = ['vpk'] if self.vpk_path else ['textures']
+        try:
+            with self.tracer.stage('rerun', stages=sorted(stages)):
+                with tempfile.TemporaryDirectory(dir=self.work_dir) as temp_dir:
+                    pipeline = self.build_pipeline(Path(temp_dir))
+                    success = asyncio.run(pipeline.run(targets, seed))
+                    success = success and all(pipeline.status.get(name, 'ok') == 'ok' for name in ('vmts', 'textures'))
+                self.manifest.save()
+                return success
+        finally:
+            if self.trace_path:
+                self.tracer.save(self.trace_path)
+
+    def build_pipeline(self, temp_path):
+        """Stage graph of one conversion (dependencies are passed as arguments)"""
+        weapon_dir = temp_path / "knife"
+        glove_dir = temp_path / "glove"
+        anim_model = self.resolve_anim_model(self.weapon_anim)
+        final_qc = self.output_dir / f"{self.model_name}.qc"
+
+        pipeline = Pipeline()
+        pipeline.add('decompile_weapon', partial(self.decompile_model_async, self.weapon_model, weapon_dir),
+                     title=f"Decompiling {self.weapon_model.name}", critical=True)
+        pipeline.add('decompile_glove', partial(self.decompile_model_async, self.glove_model, glove_dir),
+                     title=f"Decompiling {self.glove_model.name}", critical=True)
+        pipeline.add('decompile_anim', partial(self.decompile_model_async, anim_model, temp_path / "anim"),
+                     title=f"Decompiling {anim_model.name if anim_model else 'animations'}",
+                     critical=True, enabled=anim_model is not None)
+        # Only depends on the weapon type
+        pipeline.add('scripts', self.copy_scripts, title="Copying scripts")
+        pipeline.add('smds', self.copy_smds, ('decompile_weapon', 'decompile_glove'),
+                     title="Copying SMDs", critical=True)
+        pipeline.add('animations', partial(self.copy_animations, anim_model, temp_path, self.output_dir),
+                     ('decompile_anim',), title="Processing animations",
+                     enabled=anim_model is not None, default=(None, None, None))
+        # Runs while the animation model is still decompiling
+        pipeline.add('materials', self.find_materials, ('smds',), title="Finding materials")
+        pipeline.add('cdmaterials', self.cdmaterials_paths, ('materials',), title="Resolving $cdmaterials")
+        pipeline.add('lods', self.generate_lods, ('smds',), title="Generating LODs",
+                     critical=True, enabled=bool(self.lod_ratios))
+        pipeline.add('qc', partial(self.write_qc, weapon_dir, glove_dir, final_qc),
+                     ('smds', 'materials', 'cdmaterials', 'animations'), title="Generating QC", critical=True)
+        pipeline.add('compile', partial(self.compile_stage, final_qc), ('qc', 'smds', 'animations', 'lods'),
+                     title="Compiling", critical=True)
+        pipeline.add('vmts', self.fix_vmts, ('materials',), title="Fixing VMT materials")
+        pipeline.add('textures', lambda vmts: self.copy_textures(), ('vmts',), title="Copying textures",
+                     enabled=self.copy_vtfs)
+        # Waits for the material stages but packs whatever they produced (a missing texture does not block it)
+        pipeline.add('vpk', lambda compiled: self.package_vpk(), ('compile',), after=('scripts', 'vmts', 'textures'),
+                     title="Packaging VPK", critical=True, enabled=bool(self.vpk_path))
+        return pipeline
+
+    def write_qc(self, weapon_dir, glove_dir, final_qc, smds, materials, cdmaterials, animations):
+        """QC from the decompiled weapon/glove QCs"""
+        anim_qc, anim_dir, actual_anim_model = animations
+        qcs = []
+        for directory in (weapon_dir, glove_dir):
+            found = sorted(directory.glob("*.qc"))
+            if not found:
+                raise ToolError(f"Crowbar produced no QC in {directory}")
+            qcs.append(found[0])
+        weapon_qc, glove_qc = qcs
+        self.generate_qc(weapon_qc, glove_qc, anim_qc, final_qc, materials, actual_anim_model, cdmaterials)
+        return final_qc
+
+    def compile_stage(self, final_qc, qc, smds, animations, lods):
+        """Compile (skipped when QC, SMDs, animations, LODs and gameinfo are unchanged)"""
+        lod_files = self.manifest.outputs('lods') if self.lod_ratios else []
+        inputs = self.manifest.fingerprint(final_qc, smds, self.manifest.outputs('animations'), lod_files,
+                                           self.gameinfo, tool_version(self.studiomdl))
+        if self.manifest.up_to_date('compile', inputs):
+            logger.info(f"[main] Up to date: {self.model_name}.mdl")
+            return True
+        success = self.compile_model(final_qc, self.output_dir, smds + lod_files)
+        if success:
+            self.manifest.record('compile', inputs, self.compiled_files())
+        return success
+
+    def dry_run(self):
+        """Print the stage plan without running anything"""
+        pipeline = self.build_pipeline(Path(tempfile.gettempdir()) / "skin2momentum")
+        logger.info(f"[plan] {self.weapon_model.name} + {self.glove_model.name} -> {self.model_name}.mdl")
+        for line in pipeline.describe():
+            logger.info(f"[plan] {line}")
+        return True
+
+    def convert(self):
+        """Run the stage graph"""
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+
+            if self.work_dir:
+                self.work_dir.mkdir(parents=True, exist_ok=True)
+            self.manifest.begin()
+            for path in model_files(self.weapon_model) + model_files(self.glove_model) + [self.gameinfo]:
+                self.manifest.record_input(path)
+            for script in sorted(self.scripts_dir.glob("*.txt")):
+                self.manifest.record_input(script)
+        except OSError as e:
+            logger.error(f"[main] ERROR: {e}")
+            logger.info("[main] Result: FAILED")
+            return False
+
+        with tempfile.TemporaryDirectory(dir=self.work_dir) as temp_dir:
+            pipeline = self.build_pipeline(Path(temp_dir))
+            try:
+                success = asyncio.run(pipeline.run())
+            except ToolError as e:
+                logger.error(f"[main] Decompile failed: {e}")
+                logger.info("[main] Result: FAILED")
+                return False
+            except Exception as e:
+                logger.error(f"[main] ERROR: {e}")
+                logger.info("[main] Result: FAILED")
                 return False
             
-            # Find QC files
-            weapon_qc = list(weapon_dir.glob("*.qc"))[0]
-            glove_qc = list(glove_dir.glob("*.qc"))[0]
-            
-            # Copy SMDs (no merging)
-            print("\n[main] 2. Copying SMDs")
-            weapon_output = self.output_dir / f"{Path(self.weapon_model).stem}.smd"
-            glove_output = self.output_dir / f"{Path(self.glove_model).stem}.smd"
-            
-            shutil.copy2(weapon_smd, weapon_output)
-            shutil.copy2(glove_smd, glove_output)
-            
-            print(f"[main] Copied: {weapon_smd.name} -> {weapon_output.name}")
-            print(f"[main] Copied: {glove_smd.name} -> {glove_output.name}")
-            
-            # Find materials from SMDs for QC generation
-            all_materials = []
-            materials = find_materials_from_smd(weapon_output)
-            all_materials.extend(materials)
-            materials = find_materials_from_smd(glove_output)
-            all_materials.extend(materials)
-            unique_materials = list(set(all_materials))
-            print(f"[main] Materials found: {unique_materials}")
-            
-            # Animations
-            print("\n[main] 3. Processing animations")
-            anim_qc, anim_dir, actual_anim_model = self.copy_animations(self.weapon_anim, temp_path, self.output_dir)
-            
-            # Generate QC
-            print("\n[main] 4. Generating QC")
-            final_qc = self.output_dir / f"{self.model_name}.qc"
-            self.generate_qc(weapon_qc, glove_qc, anim_qc, final_qc, unique_materials, actual_anim_model)
-            
-            # Compile
-            print("\n[main] 5. Compiling")
-            success = self.compile_model(final_qc, self.output_dir)
-            
-            # Copy scripts
-            if success:
-                print("\n[main] 6. Copying scripts")
-                script_success = self.copy_scripts()
-                if not script_success:
-                    print("[main] Script copying failed")
-                
-                # Fix VMT materials
-                print("\n[main] 7. Fixing VMT materials")
-                vmt_success = self.fix_vmts()
-                if not vmt_success:
-                    print("[main] VMT fixing failed")
-            
-            print(f"[main] Result: {'SUCCESS' if success else 'FAILED'}")
+            self.manifest.save()
+            staged = ', '.join(f"{count} {method}" for method, count in sorted(self.stager.stats().items()))
+            logger.info(f"[main] Staged files: {staged or 'none'}")
+            logger.info(f"[main] Result: {'SUCCESS' if success else 'FAILED'}")
             return success
 
+def count_files(directory):
+    """Files under directory"""
+    return sum(len(files) for _, _, files in os.walk(directory))
+
+def add_cache_args(parser):
+    """Decompile cache options"""
+    parser.add_argument('--cache-dir', help='Decompile cache directory')
+    parser.add_argument('--cache-size', type=int, help='Decompile cache size cap in MB (default: 2048)')
+    parser.add_argument('--no-cache', action='store_true', help='Always run the decompiler')
+
+def add_vpk_args(parser):
+    """VPK output options"""
+    parser.add_argument('--vpk', help='Also pack model, scripts and materials into this VPK '
+                                      '(<name>_dir.vpk writes split archives)')
+    parser.add_argument('--vpk-version', type=int, choices=[1, 2], default=1, help='VPK format version')
+
+def add_compile_args(parser):
+    """Compile pool options"""
+    parser.add_argument('--compile-workers', type=int,
+                        help='studiomdl processes allowed at once (default: CPU count)')
+    parser.add_argument('--compile-dir', help='Reused compile game dirs (default: user cache dir)')
+    parser.add_argument('--compile-timeout', type=int,
+                        help=f'Base compile timeout in seconds, grows with SMD size (default: {COMPILE_TIMEOUT_BASE})')
+
+def add_geometry_args(parser):
+    """SMD geometry options (need numpy)"""
+    parser.add_argument('--fit-bbox', action='store_true',
+                        help='Write $bbox/$cbox fitted to the weapon and glove geometry')
+    parser.add_argument('--prune-bones', action='store_true',
+                        help='Drop $definebone for bones no vertex, attachment or bonemerge uses')
+
+def parse_lod_ratios(text):
+    """--lods value (lod.py, and numpy with it, is only imported when the option is given)"""
+    from lod import lod_ratios
+    return lod_ratios(text)
+
+def add_lod_args(parser):
+    """LOD options (need numpy)"""
+    parser.add_argument('--lods', type=parse_lod_ratios,
+                        help='Triangle ratios of generated LODs, e.g. 0.5,0.25 (quadric edge collapse)')
+    parser.add_argument('--lod-switch', type=float,
+                        help=f'$lod switch point step, LOD n uses n * step (default: {LOD_SWITCH_STEP})')
+
+def add_texture_args(parser):
+    """Texture options"""
+    parser.add_argument('--max-texture-size', type=int,
+                        help='Drop top mip levels until textures fit this size (no re-encoding)')
+    parser.add_argument('--no-textures', action='store_true', help='Do not copy VTFs')
+
 def parse_args():
     """Command line"""
     parser = argparse.ArgumentParser()
@@ -374,14 +926,40 @@ def parse_args():
     parser.add_argument('-weapon', required=True, help='Weapon model path')
     parser.add_argument('-gloves', required=True, help='Glove model path')
     parser.add_argument('-type', required=True, choices=['knife', 'pistol'], help='Knife or Pistol')
+    parser.add_argument('-crowbar', help='Crowbar decompiler (default: thirdparty)')
+    parser.add_argument('-studiomdl', help='studiomdl (default: <game>/bin/win64)')
+    parser.add_argument('-work', help='Temp work root (same filesystem as -output lets SMDs be linked, not copied)')
+    parser.add_argument('-store', help='Content store shared between outputs (identical animations, VMTs and VTFs '
+                                       'are stored once and linked; clean up with content_store.py <store> gc)')
+    add_cache_args(parser)
+    parser.add_argument('--force', action='store_true', help='Ignore the build manifest and rebuild every stage')
+    parser.add_argument('--trace', help='Write per-stage timings as a Chrome trace-event JSON file')
+    add_vpk_args(parser)
+    add_texture_args(parser)
+    add_compile_args(parser)
+    add_geometry_args(parser)
+    add_lod_args(parser)
+    parser.add_argument('--dry-run', action='store_true', help='Print the stage plan and exit')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and reconvert when files under -data change')
+    parser.add_argument('--debounce', type=float,
+                        help='Seconds to wait for more changes before reconverting (default: 0.5)')
+    parser.add_argument('--poll', action='store_true', help='Watch by polling instead of inotify')
 
     return parser.parse_args()
 
 if __name__ == "__main__":
     try:
         args = parse_args()
+        log_to_console()
         converter = Converter(args)
-        success = converter.main()
+        if args.dry_run:
+            converter.dry_run()
+            sys.exit(0)
+        if args.watch:
+            success = converter.watch(args.debounce, args.poll)
+        else:
+            success = converter.main()
         
         if success:
             print(f"\n[skin2momentum] Model '{converter.model_name}.mdl' created")
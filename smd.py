@@ -0,0 +1,216 @@
+"""
+skin2momentum
+smd - SMD reader into NumPy arrays (bounds, bone usage) and writer
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    # Optional: only --fit-bbox / --prune-bones / LODs need it
+    np = None
+
+def require_numpy(feature):
+    """Raise a readable error when numpy is missing"""
+    if np is None:
+        raise ValueError(f"[smd] {feature} needs numpy (pip install numpy)")
+
+class SMD:
+    """Reference SMD as arrays.
+
+    nodes: [(id, name, parent id)]
+    skeleton: (nodes, 6) frame 0 position + rotation, row order follows nodes
+    materials: material names, triangle_materials: (T,) index into materials
+    positions/normals: (3T, 3), uvs: (3T, 2), parents: (3T,) bone of each vertex
+    link_bones/link_weights: (3T, K), unused links are -1 / 0
+    """
+
+    def __init__(self, nodes, skeleton, materials, triangle_materials, vertices, link_bones, link_weights):
+        self.nodes = nodes
+        self.skeleton = skeleton
+        self.materials = materials
+        self.triangle_materials = triangle_materials
+        self.parents = vertices[:, 0].astype(np.int32)
+        self.positions = vertices[:, 1:4]
+        self.normals = vertices[:, 4:7]
+        self.uvs = vertices[:, 7:9]
+        self.link_bones = link_bones
+        self.link_weights = link_weights
+
+    @property
+    def triangle_count(self):
+        return len(self.triangle_materials)
+
+    def bounds(self):
+        """(mins, maxs) of all vertices, None without triangles"""
+        if not len(self.positions):
+            return None
+        return self.positions.min(axis=0), self.positions.max(axis=0)
+
+    def used_bone_ids(self):
+        """Node ids any vertex is weighted to"""
+        weighted = self.link_bones[self.link_weights > 0]
+        # Weight not covered by links goes to the vertex's parent bone
+        covered = self.link_weights.sum(axis=1) if self.link_weights.size else np.zeros(len(self.parents))
+        parents = self.parents[covered < 0.999]
+        return set(np.unique(np.concatenate([weighted, parents])).tolist())
+
+    def used_bones(self):
+        """Names of weighted bones"""
+        used = self.used_bone_ids()
+        return {name for node_id, name, _ in self.nodes if node_id in used}
+
+    def write(self, path, triangles=None, triangle_materials=None):
+        """Write as SMD (triangles: (N, 3) corner indices into the arrays, default all)"""
+        if triangles is None:
+            triangles = np.arange(len(self.positions)).reshape(-1, 3)
+            triangle_materials = self.triangle_materials
+        lines = ["version 1", "nodes"]
+        lines += [f'{node_id} "{name}" {parent}' for node_id, name, parent in self.nodes]
+        lines += ["end", "skeleton", "time 0"]
+        for (node_id, _, _), frame in zip(self.nodes, self.skeleton):
+            lines.append(f"{node_id} " + ' '.join(f"{value:.6f}" for value in frame))
+        lines += ["end", "triangles"]
+
+        vertex_lines = {}
+        for triangle, material in zip(triangles.tolist(), triangle_materials.tolist()):
+            lines.append(self.materials[material])
+            for i in triangle:
+                if i not in vertex_lines:
+                    vertex_lines[i] = self._vertex_line(i)
+                lines.append(vertex_lines[i])
+        lines.append("end")
+        Path(path).write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+    def _vertex_line(self, i):
+        values = [self.positions[i], self.normals[i], self.uvs[i]]
+        line = f"{self.parents[i]} " + ' '.join(f"{v:.6f}" for part in values for v in part)
+        links = [(bone, weight) for bone, weight in zip(self.link_bones[i], self.link_weights[i]) if bone >= 0]
+        if links:
+            line += f" {len(links)} " + ' '.join(f"{bone} {weight:.6f}" for bone, weight in links)
+        return line
+
+def load_smd(smd_path):
+    """Parse a reference SMD (first skeleton frame only)"""
+    require_numpy("Loading SMD geometry")
+    nodes, skeleton, triangle_lines = [], [], []
+    section = None
+    with open(smd_path, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            stripped = line.strip()
+            if not stripped or stripped.startswith('//'):
+                continue
+            if section is None:
+                if stripped in ('nodes', 'skeleton', 'triangles'):
+                    section = stripped
+                continue
+            if stripped == 'end':
+                section = None
+            elif section == 'nodes':
+                node_id, rest = stripped.split(None, 1)
+                name, _, parent = rest.rpartition(' ')
+                nodes.append((int(node_id), name.strip('"'), int(parent)))
+            elif section == 'skeleton':
+                if stripped.startswith('time'):
+                    # Reference pose only
+                    if skeleton:
+                        section = 'skip'
+                    continue
+                skeleton.append(stripped)
+            elif section == 'triangles':
+                triangle_lines.append(stripped)
+
+    # Frame 0 rows in node order
+    frame = {}
+    for row in skeleton:
+        values = row.split()
+        frame[int(values[0])] = [float(v) for v in values[1:7]]
+    skeleton_array = np.array([frame.get(node_id, [0.0] * 6) for node_id, _, _ in nodes], dtype=np.float64).reshape(-1, 6)
+
+    # Material line, then three vertex lines per triangle
+    count = len(triangle_lines) // 4
+    material_lines = triangle_lines[0:count * 4:4]
+    vertex_lines = [line for i, line in enumerate(triangle_lines[:count * 4]) if i % 4]
+    materials, triangle_materials = np.unique(np.array(material_lines, dtype=object), return_inverse=True) \
+        if count else (np.array([], dtype=object), np.zeros(0, dtype=np.int64))
+
+    vertices, link_bones, link_weights = _parse_vertices(vertex_lines)
+    return SMD(nodes, skeleton_array, [str(m) for m in materials], triangle_materials,
+               vertices, link_bones, link_weights)
+
+def _parse_vertices(vertex_lines):
+    """(3T, 9) fixed fields, (3T, K) link bones and weights"""
+    if not vertex_lines:
+        return np.zeros((0, 9)), np.zeros((0, 0), dtype=np.int32), np.zeros((0, 0))
+
+    widths = {line.count(' ') for line in vertex_lines[:64]}
+    if len(widths) == 1:
+        # Usual case: one link layout for the whole file, parse in a single call
+        flat = np.array(' '.join(vertex_lines).split(), dtype=np.float64)
+        if flat.size % len(vertex_lines) == 0:
+            table = flat.reshape(len(vertex_lines), -1)
+            if table.shape[1] == 9 or (table.shape[1] > 9 and (table[:, 9] == table[0, 9]).all()
+                                       and table.shape[1] == 10 + 2 * int(table[0, 9])):
+                links = table[:, 10:]
+                return table[:, :9], links[:, 0::2].astype(np.int32), links[:, 1::2]
+
+    # Mixed link counts: pad per line
+    rows = [line.split() for line in vertex_lines]
+    # Truncated link lists only keep the complete bone/weight pairs
+    counts = [min(int(float(row[9])), (len(row) - 10) // 2) if len(row) > 10 else 0 for row in rows]
+    max_links = max(counts, default=0)
+    vertices = np.array([row[:9] for row in rows], dtype=np.float64)
+    link_bones = np.full((len(rows), max_links), -1, dtype=np.int32)
+    link_weights = np.zeros((len(rows), max_links))
+    for i, (row, n) in enumerate(zip(rows, counts)):
+        if n:
+            link_bones[i, :n] = row[10:10 + 2 * n:2]
+            link_weights[i, :n] = row[11:11 + 2 * n:2]
+    return vertices, link_bones, link_weights
+
+def combined_bounds(smds):
+    """(mins, maxs) over several SMDs"""
+    bounds = [smd.bounds() for smd in smds if smd.bounds() is not None]
+    if not bounds:
+        return None
+    return (np.min([b[0] for b in bounds], axis=0), np.max([b[1] for b in bounds], axis=0))
+
+def required_bones(smds, extra=()):
+    """Weighted bones (by name) plus extra (attachments, bonemerge...) and all their ancestors"""
+    required = set(extra)
+    for smd in smds:
+        required |= smd.used_bones()
+        parents = {name: parent for _, name, parent in smd.nodes}
+        names = {node_id: name for node_id, name, _ in smd.nodes}
+        for name in list(required):
+            parent = parents.get(name, -1)
+            while parent >= 0 and names.get(parent) not in required:
+                required.add(names[parent])
+                parent = parents.get(names[parent], -1)
+    return required
+
+def main():
+    """python smd.py info <file.smd>..."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='+', help='Reference SMDs')
+    args = parser.parse_args()
+
+    for path in args.files:
+        smd = load_smd(path)
+        used = smd.used_bones()
+        unused = [name for _, name, _ in smd.nodes if name not in used]
+        print(f"{path}: {len(smd.nodes)} bones, {smd.triangle_count} triangles, {len(smd.materials)} materials")
+        bounds = smd.bounds()
+        if bounds is not None:
+            print(f"  bbox: {' '.join(f'{v:.3f}' for v in bounds[0])}  {' '.join(f'{v:.3f}' for v in bounds[1])}")
+        print(f"  unweighted bones ({len(unused)}): {', '.join(unused) or 'none'}")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"[smd] ERROR: {e}")
+        sys.exit(1)
@@ -0,0 +1,103 @@
+"""
+skin2momentum
+staging - place files by reflink, hardlink or copy (cheapest that works)
+"""
+
+import os
+import sys
+import stat
+import errno
+import shutil
+from collections import Counter
+from instrumentation import annotate
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+def reflink(src, dst):
+    """Copy-on-write clone (Btrfs, XFS, bcachefs...), raises OSError if unsupported"""
+    if fcntl is None or not sys.platform.startswith('linux'):
+        raise OSError(errno.EOPNOTSUPP, "reflink not supported on this platform")
+    try:
+        with open(src, 'rb') as source, open(dst, 'wb') as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+    except OSError:
+        remove_file(dst)
+        raise
+    shutil.copystat(src, dst)
+
+def clone_or_copy(src, dst):
+    """Reflink, else copy (never shares an inode, safe for caches)"""
+    remove_file(dst)
+    try:
+        reflink(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
+
+def remove_file(path):
+    """Delete path if it exists, read-only files included (Windows refuses to delete those)"""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except PermissionError:
+        os.chmod(path, stat.S_IREAD | stat.S_IWRITE)
+        os.unlink(path)
+
+def _make_writable(path):
+    """Copies of read-only store objects should not be read-only themselves"""
+    mode = os.stat(path).st_mode
+    if not mode & stat.S_IWRITE:
+        os.chmod(path, stat.S_IMODE(mode) | stat.S_IWRITE)
+
+class Stager:
+    """Places files into the output tree and counts the method used"""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def stage(self, src, dst, hardlink=True):
+        """Reflink -> hardlink -> copy, returns the method used.
+        Use hardlink=False when either side may later be edited in place."""
+        remove_file(dst)
+        method = 'copy'
+        try:
+            reflink(src, dst)
+            method = 'reflink'
+        except OSError:
+            try:
+                if not hardlink:
+                    raise OSError(errno.EPERM, "hardlink not allowed")
+                os.link(src, dst)
+                method = 'hardlink'
+            except OSError:
+                shutil.copy2(src, dst)
+        if method != 'hardlink':
+            _make_writable(dst)
+        self._count(method)
+        return method
+
+    def move(self, src, dst):
+        """Rename, or stage + remove across filesystems"""
+        try:
+            os.replace(src, dst)
+        except OSError:
+            method = self.stage(src, dst)
+            os.unlink(src)
+            return method
+        self._count('rename')
+        return 'rename'
+
+    def stats(self):
+        """{method: count}"""
+        return dict(self.counts)
+
+    def _count(self, method):
+        self.counts[method] += 1
+        annotate(**{f"staged_{method}": 1})
@@ -0,0 +1,190 @@
+"""
+skin2momentum
+tool_runner - run Crowbar/studiomdl, stream their output into logs and diagnostics
+"""
+
+import os
+import re
+import signal
+import asyncio
+import threading
+import subprocess
+from pathlib import Path
+from collections import namedtuple
+
+# Async reader buffer: longer lines are scanned in chunks of this size
+LINE_LIMIT = 1024 * 1024
+
+Diagnostic = namedtuple('Diagnostic', 'level message line')
+
+# (level, pattern) - first match wins, 'fatal' kills the tool at once
+STUDIOMDL_PATTERNS = [
+    ('fatal', re.compile(r'\bERROR\b:?')),
+    ('fatal', re.compile(r'could not (?:load|open|find) file', re.I)),
+    ('fatal', re.compile(r'unknown (?:command|option)', re.I)),
+    ('warning', re.compile(r'\bWARNING\b:?', re.I)),
+    ('warning', re.compile(r'material\b.*\b(?:not found|missing)|unable to find material', re.I)),
+    ('warning', re.compile(r'bone\b.*\b(?:not found|missing)|unknown bone|too many bones', re.I)),
+]
+CROWBAR_PATTERNS = [
+    ('fatal', re.compile(r'^\s*ERROR\b', re.I)),
+    ('fatal', re.compile(r'Unhandled exception|System\.\w+Exception')),
+    ('warning', re.compile(r'^\s*WARNING\b', re.I)),
+]
+
+class ToolError(Exception):
+    """A tool failed, timed out or was given missing input"""
+
+class ToolResult:
+    """Exit code, matched diagnostics and the log of one tool run"""
+
+    def __init__(self, returncode, diagnostics, log_path=None, aborted=False):
+        self.returncode = returncode
+        self.diagnostics = diagnostics
+        self.log_path = log_path
+        self.aborted = aborted
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.aborted
+
+    @property
+    def fatal(self):
+        """First fatal diagnostic or None"""
+        return next((d for d in self.diagnostics if d.level == 'fatal'), None)
+
+    @property
+    def warnings(self):
+        return [d for d in self.diagnostics if d.level == 'warning']
+
+class OutputScanner:
+    """Writes each line to the log and matches it against the patterns"""
+
+    def __init__(self, log_path=None, patterns=()):
+        self.log_path = Path(log_path) if log_path else None
+        self.patterns = patterns
+        self.diagnostics = []
+        self.count = 0
+        self.log = None
+        if self.log_path:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            self.log = open(self.log_path, 'w', encoding='utf-8')
+
+    def feed(self, line):
+        """Record one line, True if it is fatal"""
+        self.count += 1
+        if self.log:
+            self.log.write(line if line.endswith('\n') else line + '\n')
+        for level, pattern in self.patterns:
+            if pattern.search(line):
+                self.diagnostics.append(Diagnostic(level, line.strip(), self.count))
+                return level == 'fatal'
+        return False
+
+    def result(self, returncode, aborted):
+        if self.log:
+            self.log.close()
+        return ToolResult(returncode, self.diagnostics, self.log_path, aborted)
+
+def _popen_args(cwd):
+    return {
+        'stdout': subprocess.PIPE,
+        'stderr': subprocess.STDOUT,
+        'cwd': str(cwd) if cwd else None,
+        # Own process group so wrapper scripts die with their children
+        'start_new_session': os.name == 'posix',
+    }
+
+def run_tool(cmd, timeout, log_path=None, patterns=(), cwd=None):
+    """Run cmd streaming its output, kill it on the first fatal line or on timeout"""
+    scanner = OutputScanner(log_path, patterns)
+    process = subprocess.Popen([str(part) for part in cmd], text=True, errors='replace', **_popen_args(cwd))
+    timed_out = threading.Event()
+
+    def on_timeout():
+        timed_out.set()
+        kill_process(process)
+
+    timer = threading.Timer(timeout, on_timeout)
+    timer.start()
+    aborted = False
+    try:
+        for line in process.stdout:
+            if scanner.feed(line):
+                aborted = True
+                kill_process(process)
+                break
+        process.wait()
+    finally:
+        timer.cancel()
+        if process.returncode is None:
+            kill_process(process)
+            process.wait()
+        process.stdout.close()
+        result = scanner.result(process.returncode, aborted)
+
+    if timed_out.is_set():
+        raise ToolError(f"Timed out after {timeout:.0f}s: {Path(str(cmd[0])).name}")
+    return result
+
+async def run_process(cmd, timeout, cwd=None, log_path=None, patterns=()):
+    """Async run_tool: kill cmd on the first fatal line, timeout or cancellation"""
+    scanner = OutputScanner(log_path, patterns)
+    process = await asyncio.create_subprocess_exec(
+        *[str(part) for part in cmd], limit=LINE_LIMIT, **_popen_args(cwd))
+
+    async def read_output():
+        while True:
+            try:
+                line = await process.stdout.readuntil(b'\n')
+            except asyncio.IncompleteReadError as e:
+                # Last line without a newline (empty at EOF)
+                line = e.partial
+            except asyncio.LimitOverrunError:
+                # readline() would drop the buffer and raise, scan the long line piece by piece
+                line = await process.stdout.read(LINE_LIMIT)
+            if not line:
+                return False
+            if scanner.feed(line.decode('utf-8', errors='replace')):
+                return True
+
+    aborted = False
+    try:
+        aborted = await asyncio.wait_for(read_output(), timeout)
+        if aborted:
+            kill_process(process)
+        await process.wait()
+    except asyncio.TimeoutError:
+        raise ToolError(f"Timed out after {timeout}s: {cmd[0]}")
+    finally:
+        # Timeout, fatal output or cancelled by a failing sibling
+        if process.returncode is None:
+            kill_process(process)
+            await process.wait()
+        result = scanner.result(process.returncode, aborted)
+    return result
+
+def kill_process(process):
+    """Kill a tool and (on POSIX) its process group"""
+    if os.name == 'posix':
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+            return
+        except OSError:
+            pass
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
+
+async def run_fail_fast(tasks):
+    """Wait for all tasks, on the first failure cancel the rest and re-raise"""
+    tasks = [task for task in tasks if task is not None]
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    failed = [task for task in done if not task.cancelled() and task.exception()]
+    if failed:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        raise failed[0].exception()
+    return [task.result() for task in tasks]
@@ -3,38 +3,167 @@ skin2momentum
 vmt_fixer - converts CS:GO materials to Momentum Mod compatible
 """
 
-import re
+import os
 from pathlib import Path
+from itertools import islice
+from collections import deque
+from material_index import MaterialIndex
+from keyvalues import KeyValues, parse, dump, keyvalues_cache
+from staging import remove_file
+from events import get_logger
 
-def fix_vmt(vmt_content, material_name, material_rel_path, csgo_materials_dir):
-    """Convert CS:GO VMT to VertexLitGeneric with proper paths"""
+logger = get_logger('vmt_fixer')
 
-    # Extract original paths from VMT
-    basetexture_match = re.search(r'"?\$basetexture"?\s+"([^"]+)"', vmt_content, re.IGNORECASE)
-    bumpmap_match = re.search(r'"?\$bumpmap"?\s+"([^"]+)"', vmt_content, re.IGNORECASE)
+# SMDs are streamed, never loaded whole
+SMD_READ_BUFFER = 1024 * 1024
+
+# patch -> include -> include... deeper than this is a loop
+MAX_PATCH_DEPTH = 8
+
+# How CS:GO parameters carry over to VertexLitGeneric (anything not listed is dropped):
+#   'keep'    copied as is
+#   'texture' copied if the VTF exists ($basetexture/$bumpmap have their own lookup below)
+SHADER_RULES = {
+    '$phong': 'keep', '$phongboost': 'keep', '$phongexponent': 'keep', '$phongfresnelranges': 'keep',
+    '$phongtint': 'keep', '$phongalbedotint': 'keep', '$phongalbedoboost': 'keep',
+    '$basemapalphaphongmask': 'keep', '$invertphongmask': 'keep', '$phongexponenttexture': 'texture',
+    '$envmap': 'texture', '$envmapmask': 'texture', '$envmaptint': 'keep', '$envmapcontrast': 'keep',
+    '$envmapsaturation': 'keep', '$envmapfresnel': 'keep', '$normalmapalphaenvmapmask': 'keep',
+    '$basealphaenvmapmask': 'keep', '$selfillum': 'keep', '$selfillumtint': 'keep', '$selfillummask': 'texture',
+    '$lightwarptexture': 'texture', '$detail': 'texture', '$detailscale': 'keep', '$detailblendmode': 'keep',
+    '$detailblendfactor': 'keep', '$rimlight': 'keep', '$rimlightexponent': 'keep', '$rimlightboost': 'keep',
+    '$rimmask': 'keep', '$halflambert': 'keep', '$translucent': 'keep', '$alphatest': 'keep',
+    '$alphatestreference': 'keep', '$allowalphatocoverage': 'keep', '$nocull': 'keep', '$additive': 'keep',
+    '$color2': 'keep', '$surfaceprop': 'keep',
+}
+TEXTURE_PARAMETERS = ('$basetexture', '$bumpmap') + tuple(k for k, rule in SHADER_RULES.items() if rule == 'texture')
+
+# Written when the source VMT does not set them
+PHONG_DEFAULTS = {'$phong': '1', '$phongboost': '1', '$phongexponent': '20', '$phongfresnelranges': '[1 1 1]'}
+
+# Engine proxies Momentum has; CS:GO item proxies (WeaponSkin, ItemTintColor...) are dropped
+GENERIC_PROXIES = {
+    'sine', 'add', 'subtract', 'multiply', 'divide', 'equals', 'abs', 'frac', 'int', 'clamp', 'lessorequal',
+    'selectfirstifnonzero', 'exponential', 'linearramp', 'uniformnoise', 'gaussiannoise', 'wrapminmax',
+    'animatedtexture', 'texturescroll', 'texturetransform', 'currenttime',
+}
+
+class DirectoryCache:
+    """Lists each folder once, file probes become set lookups"""
+
+    def __init__(self):
+        self.listings = {}
+        # Material index per root the listings were taken with (a new object means it was rebuilt)
+        self.indexes = {}
+        self.hits = 0
+        self.misses = 0
+        self.indexed = 0
+
+    def exists(self, path, index=None):
+        """Path.exists() for files, folder listed on first use"""
+        if index is not None and self.indexes.get(index.root) is not index:
+            # Folders changed since the last index (or it is a new one): listings may be stale
+            self.indexes[index.root] = index
+            self.listings.clear()
+        path = Path(path)
+        folder = path.parent
+        key = os.path.normcase(str(folder))
+        listing = self.listings.get(key)
+        if listing is not None:
+            self.hits += 1
+        else:
+            # Prefer the material index, list the folder only if it is not indexed
+            listing = index.listing(folder) if index else None
+            if listing is not None:
+                self.indexed += 1
+            else:
+                self.misses += 1
+                try:
+                    listing = {name.lower() for name in os.listdir(folder)}
+                except OSError:
+                    listing = set()
+            self.listings[key] = listing
+        return path.name.lower() in listing
+
+    def invalidate(self, folder=None):
+        """Forget one folder (or everything)"""
+        if folder is None:
+            self.listings.clear()
+            self.indexes.clear()
+        else:
+            self.listings.pop(os.path.normcase(str(folder)), None)
+
+    def stats(self):
+        """Counters (misses = folders listed from the filesystem)"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'indexed': self.indexed,
+            'folders': len(self.listings),
+        }
+
+# Shared by every fix_vmt call in this process (a whole batch worker)
+directory_cache = DirectoryCache()
+
+def resolve_patch(kv, index=None, depth=0):
+    """Flatten a 'patch' VMT: its include (found through the index) with insert/replace applied"""
+    if kv.name.lower() != 'patch':
+        return kv
+    base = None
+    include = kv.get('include')
+    if isinstance(include, str) and index is not None and depth < MAX_PATCH_DEPTH:
+        rel_path = include.replace('\\', '/').strip('/')
+        if rel_path.lower().startswith('materials/'):
+            rel_path = rel_path[len('materials/'):]
+        path = index.resolve(rel_path)
+        if path:
+            base = resolve_patch(keyvalues_cache.load(path), index, depth + 1)
+    base = base.copy() if base is not None else KeyValues('VertexLitGeneric')
+
+    insert = kv.get('insert')
+    if isinstance(insert, KeyValues):
+        for name, value in insert.items:
+            base.set(name, value)
+    replace = kv.get('replace')
+    if isinstance(replace, KeyValues):
+        for name, value in replace.items:
+            if base.get(name) is not None:
+                base.set(name, value)
+    return base
+
+def fix_vmt(vmt_content, material_name, material_rel_path, csgo_materials_dir, index=None, dir_cache=None):
+    """Convert CS:GO VMT (text or parsed KeyValues) to VertexLitGeneric with proper paths"""
+
+    # Texture probes are answered from folder listings
+    dir_cache = dir_cache or directory_cache
+    exists = lambda path: dir_cache.exists(path, index)
+
+    kv = vmt_content if isinstance(vmt_content, KeyValues) else parse(vmt_content)
+    kv = resolve_patch(kv, index)
+    source = kv.values()
+    original_basetexture = source.get('$basetexture', '').strip()
+    original_bumpmap = source.get('$bumpmap', '').strip()
     material_dir = str(material_rel_path.parent).replace('\\', '/')
     material_folder = csgo_materials_dir / material_rel_path.parent
     
     # Handle basetexture
-    if basetexture_match:
-        original_basetexture = basetexture_match.group(1).strip()
-
+    if original_basetexture:
         # Handle special CS:GO cases
         if original_basetexture.lower() == "black":
             # For gloves that use "black" use the base glove texture
             base_name = material_name.split('_')[0] + '_' + material_name.split('_')[1]
             base_texture_file = material_folder / f"{base_name}.vtf"
-            if base_texture_file.exists():
+            if exists(base_texture_file):
                 basetexture = f"{material_dir}/{base_name}"
             else:
                 # Try _color suffix if no base texture
                 color_texture_file = material_folder / f"{base_name}_color.vtf"
-                if color_texture_file.exists():
+                if exists(color_texture_file):
                     basetexture = f"{material_dir}/{base_name}_color"
                 else:
                     # Fallback to material name if base doesnt exist
                     texture_file = material_folder / f"{material_name}.vtf"
-                    if texture_file.exists():
+                    if exists(texture_file):
                         basetexture = f"{material_dir}/{material_name}"
                     else:
                         basetexture = f"{material_dir}/{base_name}"
@@ -44,18 +173,18 @@ def fix_vmt(vmt_content, material_name, material_rel_path, csgo_materials_dir):
         else:
             # Check if the materials own texture file exists
             texture_file = material_folder / f"{material_name}.vtf"
-            if texture_file.exists():
+            if exists(texture_file):
                 basetexture = f"{material_dir}/{material_name}"
             else:
                 # Try base name
                 base_name = material_name.split('_')[0] + '_' + material_name.split('_')[1]
                 base_texture_file = material_folder / f"{base_name}.vtf"
-                if base_texture_file.exists():
+                if exists(base_texture_file):
                     basetexture = f"{material_dir}/{base_name}"
                 else:
                     # Try with _color suffix for gloves
                     color_texture_file = material_folder / f"{base_name}_color.vtf"
-                    if color_texture_file.exists():
+                    if exists(color_texture_file):
                         basetexture = f"{material_dir}/{base_name}_color"
                     else:
                         basetexture = f"{material_dir}/{material_name}"
@@ -63,36 +192,35 @@ def fix_vmt(vmt_content, material_name, material_rel_path, csgo_materials_dir):
     else:
         # No basetexture found, try to find appropriate texture
         texture_file = material_folder / f"{material_name}.vtf"
-        if texture_file.exists():
+        if exists(texture_file):
             basetexture = f"{material_dir}/{material_name}"
         else:
             # Try base name
             base_name = material_name.split('_')[0] + '_' + material_name.split('_')[1]
             base_texture_file = material_folder / f"{base_name}.vtf"
-            if base_texture_file.exists():
+            if exists(base_texture_file):
                 basetexture = f"{material_dir}/{base_name}"
             else:
                 # Try with _color suffix
                 color_texture_file = material_folder / f"{base_name}_color.vtf"
-                if color_texture_file.exists():
+                if exists(color_texture_file):
                     basetexture = f"{material_dir}/{base_name}_color"
                 else:
                     basetexture = f"{material_dir}/{material_name}"
     
     # Handle bumpmap
     bumpmap = None
-    if bumpmap_match:
-        original_bumpmap = bumpmap_match.group(1).strip()
+    if original_bumpmap:
         if '/' in original_bumpmap and original_bumpmap.startswith('models/'):
             # Check if the referenced texture exists
             bumpmap_rel_path = original_bumpmap.replace('models/', '') + '.vtf'
             bumpmap_file = csgo_materials_dir / 'models' / bumpmap_rel_path.replace('models/', '')
-            if bumpmap_file.exists():
+            if exists(bumpmap_file):
                 bumpmap = original_bumpmap
         else:
             # Try to find normal map in same directory
             normal_file = material_folder / f"{original_bumpmap}.vtf"
-            if normal_file.exists():
+            if exists(normal_file):
                 bumpmap = f"{material_dir}/{original_bumpmap}"
     
     # If no bumpmap found from VMT, try common patterns
@@ -104,7 +232,7 @@ def fix_vmt(vmt_content, material_name, material_rel_path, csgo_materials_dir):
         for variant in normal_variants:
             if variant:
                 normal_file = material_folder / f"{variant}.vtf"
-                if normal_file.exists():
+                if exists(normal_file):
                     bumpmap = f"{material_dir}/{variant}"
                     break
     
@@ -115,72 +243,132 @@ def fix_vmt(vmt_content, material_name, material_rel_path, csgo_materials_dir):
     if bumpmap:
         vmt_lines.append(f'\t"$bumpmap" "{bumpmap}"')
     
-    vmt_lines.extend([
-        '\t"$phong" "1"',
-        '\t"$phongboost" "1"',
-        '\t"$phongexponent" "20"',
-        '\t"$phongfresnelranges" "[1 1 1]"',
-        '}'
-    ])
-    
+    for name, default in PHONG_DEFAULTS.items():
+        vmt_lines.append(f'\t"{name}" "{source.get(name, default)}"')
+
+    # Everything else the rule table maps over
+    for name, value in source.items():
+        rule = SHADER_RULES.get(name)
+        if not rule or name in PHONG_DEFAULTS:
+            continue
+        if rule == 'texture' and value.lower() != 'env_cubemap':
+            texture = value.replace('\\', '/').strip('/')
+            if not exists(csgo_materials_dir / f"{texture}.vtf"):
+                continue
+        vmt_lines.append(f'\t"{name}" "{value}"')
+
+    proxies = kv.get('proxies')
+    if isinstance(proxies, KeyValues):
+        kept = [[name, block] for name, block in proxies.items if name.lower() in GENERIC_PROXIES]
+        if kept:
+            vmt_lines.append(dump(KeyValues('Proxies', kept), 1))
+
+    vmt_lines.append('}')
     return '\n'.join(vmt_lines)
 
+def fix_vmt_files(vmt_files, csgo_materials_dir, index=None, dir_cache=None):
+    """Batch fix_vmt over [(vmt path, material name)], each file parsed once per process.
+    Returns [(vmt path, fixed text or the exception)]"""
+    csgo_materials_dir = Path(csgo_materials_dir)
+    results = []
+    for vmt_file, material in vmt_files:
+        try:
+            kv = keyvalues_cache.load(vmt_file)
+            rel_path = Path(vmt_file).relative_to(csgo_materials_dir)
+            results.append((vmt_file, fix_vmt(kv, material, rel_path, csgo_materials_dir, index, dir_cache)))
+        except (OSError, ValueError, IndexError) as e:
+            results.append((vmt_file, e))
+    return results
+
+def texture_keys(vmt_content):
+    """[(key, texture path)] for every texture parameter ($basetexture, $bumpmap, $envmapmask...)"""
+    try:
+        kv = resolve_patch(parse(vmt_content))
+    except ValueError:
+        return []
+    source = kv.values()
+    return [(name[1:], source[name].strip()) for name in TEXTURE_PARAMETERS
+            if source.get(name, '').strip() and source[name].strip().lower() != 'env_cubemap']
+
+def texture_references(vmt_content):
+    """Texture paths referenced by a VMT (every parameter in TEXTURE_PARAMETERS)"""
+    return [texture for _, texture in texture_keys(vmt_content)]
+
 def find_materials_from_smd(smd_file):
     """Find material names in SMD file"""
     try:
-        content = smd_file.read_text(encoding='utf-8', errors='ignore')
-        materials = []
-        in_triangles = False
-        
-        for line in content.splitlines():
-            line = line.strip()
-            if line == 'triangles':
-                in_triangles = True
-            elif line == 'end':
-                in_triangles = False
-            elif in_triangles and line and not re.match(r'^[\d\.\-\s]+$', line) and len(line.split()) == 1:
-                if line not in materials:
-                    materials.append(line)
-        return materials
-    except:
+        materials = {}
+        with open(smd_file, 'rb', buffering=SMD_READ_BUFFER) as f:
+            for line in f:
+                if line.strip() != b'triangles':
+                    continue
+
+                # Each triangle is one material line followed by three vertex lines
+                for line in f:
+                    name = line.strip()
+                    if not name:
+                        continue
+                    if name == b'end':
+                        break
+                    # Material names are a single token, like the original line check
+                    if len(name.split()) != 1:
+                        continue
+                    materials[name] = None
+                    deque(islice(f, 3), maxlen=0)
+
+        return [name.decode('utf-8', errors='ignore') for name in materials]
+    except Exception:
         return []
 
-def process_materials(csgo_materials_dir, output_dir, material_names):
-    """Process and fix VMTs"""
-    print(f"[vmt_fixer] Processing {len(material_names)} materials")
+def process_materials(csgo_materials_dir, output_dir, material_names, index=None, store=None, stager=None):
+    """Process and fix VMTs (linked from the content store when given, identical VMTs are stored once)"""
+    logger.info(f"[vmt_fixer] Processing {len(material_names)} materials")
+    if index is None:
+        index = MaterialIndex.load(csgo_materials_dir)
+    written = []
     
+    vmt_files = []
     for material in material_names:
         # Find VMT file
-        vmt_files = list(csgo_materials_dir.rglob(f"{material}.vmt"))
-        
-        if not vmt_files:
-            print(f"[vmt_fixer] VMT not found for {material}")
+        found = index.find_vmts(material)
+        if not found:
+            logger.warning(f"[vmt_fixer] VMT not found for {material}")
+        vmt_files.extend((vmt_file, material) for vmt_file in found)
+
+    for (vmt_file, material), (_, fixed) in zip(vmt_files, fix_vmt_files(vmt_files, index.root, index)):
+        if isinstance(fixed, Exception):
+            logger.error(f"[vmt_fixer] Error fixing {material}: {fixed}")
             continue
-            
-        for vmt_file in vmt_files:
-            try:
-                original = vmt_file.read_text(encoding='utf-8')
-                rel_path = vmt_file.relative_to(csgo_materials_dir)
-                fixed = fix_vmt(original, material, rel_path, csgo_materials_dir)
-                
-                output_file = output_dir / rel_path
-                output_file.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            rel_path = vmt_file.relative_to(index.root)
+            output_file = output_dir / rel_path
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            if store:
+                store.link_bytes(fixed.encode('utf-8'), output_file, stager)
+            else:
+                # The old file may be a link to a stored object, never write through it
+                remove_file(output_file)
                 output_file.write_text(fixed, encoding='utf-8')
-                
-                print(f"[vmt_fixer] Fixed: {material} -> {rel_path}")
-                
-            except Exception as e:
-                print(f"[vmt_fixer] Error fixing {material}: {e}")
+            written.append(output_file)
+
+            logger.info(f"[vmt_fixer] Fixed: {material} -> {rel_path}")
+
+        except Exception as e:
+            logger.error(f"[vmt_fixer] Error fixing {material}: {e}")
+
+    return written
 
-def get_cdmaterials_paths(csgo_materials_dir, material_names):
+def get_cdmaterials_paths(csgo_materials_dir, material_names, index=None):
     """Generate $cdmaterials paths for QC based on actual material locations"""
     paths = set()
+    if index is None:
+        index = MaterialIndex.load(csgo_materials_dir)
     
     for material in material_names:
-        vmt_files = list(csgo_materials_dir.rglob(f"{material}.vmt"))
+        vmt_files = index.find_vmts(material)
         
         for vmt_file in vmt_files:
-            rel_path = vmt_file.relative_to(csgo_materials_dir)
+            rel_path = vmt_file.relative_to(index.root)
             dir_path = str(rel_path.parent).replace('\\', '/')
             if dir_path and dir_path != '.':
                 paths.add(f'"{dir_path}/"')
@@ -0,0 +1,252 @@
+"""
+skin2momentum
+vpk - VPK v1/v2 writer (and a small reader) without Valve tools
+"""
+
+import os
+import sys
+import zlib
+import struct
+import hashlib
+import argparse
+from pathlib import Path
+from events import get_logger, log_to_console
+
+logger = get_logger('vpk')
+
+VPK_SIGNATURE = 0x55AA1234
+ENTRY_TERMINATOR = 0xFFFF
+# Archive index meaning "data follows the tree in the _dir.vpk"
+EMBEDDED_ARCHIVE = 0x7FFF
+DEFAULT_ARCHIVE_SIZE = 200 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+def split_entry_path(archive_path):
+    """'models/weapons/v_knife_t.mdl' -> ('mdl', 'models/weapons', 'v_knife_t')"""
+    archive_path = archive_path.replace('\\', '/').strip('/').lower()
+    directory, _, filename = archive_path.rpartition('/')
+    stem, dot, ext = filename.rpartition('.')
+    if not dot:
+        stem, ext = filename, ''
+    # The format stores empty components as a single space
+    return ext or ' ', directory or ' ', stem or ' '
+
+class VPKWriter:
+    """Streams files into a VPK, identical contents are stored once.
+
+    split=False: one <name>.vpk with the data embedded after the tree.
+    split=True:  <name>_dir.vpk tree plus <name>_000.vpk, _001.vpk... data archives.
+    """
+
+    def __init__(self, vpk_path, version=1, split=False, archive_size=DEFAULT_ARCHIVE_SIZE):
+        if version not in (1, 2):
+            raise ValueError(f"[vpk] Unsupported VPK version {version}. Must be 1 or 2")
+        self.path = Path(vpk_path)
+        self.version = version
+        self.split = split
+        self.archive_size = archive_size
+        self.entries = {}
+        self.blobs = {}
+        self.deduplicated = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.archive_index = 0 if split else EMBEDDED_ARCHIVE
+        self.data = open(self._data_path(), 'w+b')
+
+    def _data_path(self):
+        if not self.split:
+            return self.path.with_name(self.path.name + '.data.tmp')
+        base = self.path.name[:-len('_dir.vpk')] if self.path.name.endswith('_dir.vpk') else self.path.stem
+        return self.path.with_name(f"{base}_{self.archive_index:03d}.vpk")
+
+    def add_file(self, archive_path, source_path):
+        """Stream a file into the archive"""
+        with open(source_path, 'rb') as f:
+            self._add(archive_path, iter(lambda: f.read(CHUNK_SIZE), b''))
+
+    def add_bytes(self, archive_path, data):
+        """Add in-memory data"""
+        self._add(archive_path, [data])
+
+    def _add(self, archive_path, chunks):
+        key = split_entry_path(archive_path)
+        if key in self.entries:
+            raise ValueError(f"[vpk] Duplicate entry: {archive_path}")
+
+        if self.split and self.data.tell() >= self.archive_size:
+            self.data.close()
+            self.archive_index += 1
+            self.data = open(self._data_path(), 'w+b')
+
+        offset = self.data.tell()
+        crc = 0
+        digest = hashlib.sha256()
+        for chunk in chunks:
+            crc = zlib.crc32(chunk, crc)
+            digest.update(chunk)
+            self.data.write(chunk)
+        length = self.data.tell() - offset
+
+        blob = self.blobs.get(digest.digest())
+        if blob:
+            # Already stored: drop what we just wrote and point at the first copy
+            self.data.seek(offset)
+            self.data.truncate()
+            self.deduplicated += 1
+        else:
+            blob = (crc, self.archive_index, offset, length)
+            self.blobs[digest.digest()] = blob
+        self.entries[key] = blob
+
+    def close(self):
+        """Write the directory tree (and embedded data)"""
+        tree = self._tree()
+        data_size = 0 if self.split else self.data.tell()
+        self.data.flush()
+        if self.split and self.archive_index > 0 and self.data.tell() == 0 \
+                and all(blob[1] != self.archive_index for blob in self.blobs.values()):
+            # The last rollover only received duplicates
+            self.data.close()
+            os.unlink(self._data_path())
+
+        if self.version == 1:
+            header = struct.pack('<III', VPK_SIGNATURE, 1, len(tree))
+        else:
+            # No archive MD5 entries, 48-byte other-MD5 section, unsigned
+            header = struct.pack('<IIIIIII', VPK_SIGNATURE, 2, len(tree), data_size, 0, 48, 0)
+
+        whole = hashlib.md5()
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(temp_path, 'wb') as out:
+            for part in (header, tree):
+                out.write(part)
+                whole.update(part)
+            if not self.split:
+                self.data.seek(0)
+                for chunk in iter(lambda: self.data.read(CHUNK_SIZE), b''):
+                    out.write(chunk)
+                    whole.update(chunk)
+            if self.version == 2:
+                other = hashlib.md5(tree).digest() + hashlib.md5(b'').digest()
+                whole.update(other)
+                out.write(other + whole.digest())
+
+        self.data.close()
+        if not self.split:
+            os.unlink(self._data_path())
+        os.replace(temp_path, self.path)
+        logger.info(f"[vpk] Wrote {self.path.name}: {len(self.entries)} entries "
+                    f"({self.deduplicated} deduplicated)")
+
+    def _tree(self):
+        tree = bytearray()
+        by_ext = {}
+        for (ext, directory, stem), blob in self.entries.items():
+            by_ext.setdefault(ext, {}).setdefault(directory, []).append((stem, blob))
+
+        for ext in sorted(by_ext):
+            tree += ext.encode() + b'\0'
+            for directory in sorted(by_ext[ext]):
+                tree += directory.encode() + b'\0'
+                for stem, (crc, archive_index, offset, length) in sorted(by_ext[ext][directory]):
+                    tree += stem.encode() + b'\0'
+                    tree += struct.pack('<IHHIIH', crc, 0, archive_index, offset, length, ENTRY_TERMINATOR)
+                tree += b'\0'
+            tree += b'\0'
+        tree += b'\0'
+        return bytes(tree)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.data.close()
+            if not self.split:
+                os.unlink(self._data_path())
+
+def read_vpk(vpk_path):
+    """{archive path: bytes} with CRCs checked"""
+    vpk_path = Path(vpk_path)
+    with open(vpk_path, 'rb') as f:
+        signature, version, tree_size = struct.unpack('<III', f.read(12))
+        if signature != VPK_SIGNATURE:
+            raise ValueError(f"[vpk] Not a VPK: {vpk_path}")
+        header_size = 12 if version == 1 else 28
+        f.seek(header_size)
+        tree = f.read(tree_size)
+        data_start = header_size + tree_size
+
+        def read_string(pos):
+            end = tree.index(b'\0', pos)
+            return tree[pos:end].decode(), end + 1
+
+        files = {}
+        pos = 0
+        while True:
+            ext, pos = read_string(pos)
+            if not ext:
+                break
+            while True:
+                directory, pos = read_string(pos)
+                if not directory:
+                    break
+                while True:
+                    stem, pos = read_string(pos)
+                    if not stem:
+                        break
+                    crc, preload, archive_index, offset, length, _ = struct.unpack_from('<IHHIIH', tree, pos)
+                    pos += 18
+                    data = tree[pos:pos + preload]
+                    pos += preload
+                    if archive_index == EMBEDDED_ARCHIVE:
+                        f.seek(data_start + offset)
+                        data += f.read(length)
+                    else:
+                        base = vpk_path.name[:-len('_dir.vpk')]
+                        with open(vpk_path.with_name(f"{base}_{archive_index:03d}.vpk"), 'rb') as archive:
+                            archive.seek(offset)
+                            data += archive.read(length)
+                    if zlib.crc32(data) != crc:
+                        raise ValueError(f"[vpk] CRC mismatch: {directory}/{stem}.{ext}")
+                    name = f"{stem}.{ext}" if ext != ' ' else stem
+                    files[name if directory == ' ' else f"{directory}/{name}"] = data
+    return files
+
+def pack_directory(vpk_path, root, files=None, version=1, split=False):
+    """Pack files (default: everything) under root, paths relative to root"""
+    root = Path(root)
+    files = sorted(files) if files is not None else sorted(p for p in root.rglob('*') if p.is_file())
+    with VPKWriter(vpk_path, version, split) as writer:
+        for path in files:
+            writer.add_file(Path(path).relative_to(root).as_posix(), path)
+    return writer
+
+def main():
+    """python vpk.py pack <dir> <out.vpk> | python vpk.py list <file.vpk>"""
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command', required=True)
+    pack = sub.add_parser('pack', help='Pack a directory')
+    pack.add_argument('directory')
+    pack.add_argument('vpk')
+    pack.add_argument('-version', type=int, default=1, choices=[1, 2])
+    pack.add_argument('-split', action='store_true', help='Write <name>_dir.vpk + <name>_000.vpk')
+    listing = sub.add_parser('list', help='List entries (checks CRCs)')
+    listing.add_argument('vpk')
+    args = parser.parse_args()
+    log_to_console()
+
+    if args.command == 'pack':
+        pack_directory(args.vpk, args.directory, version=args.version, split=args.split)
+    else:
+        for name, data in sorted(read_vpk(args.vpk).items()):
+            print(f"{len(data):>12,}  {name}")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"[vpk] ERROR: {e}")
+        sys.exit(1)
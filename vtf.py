@@ -0,0 +1,217 @@
+"""
+skin2momentum
+vtf - VTF header reader, mip-level stripping and parallel texture copying
+"""
+
+import os
+import sys
+import struct
+import shutil
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from events import get_logger
+from staging import remove_file
+
+logger = get_logger('vtf')
+
+VTF_SIGNATURE = b'VTF\0'
+TEXTUREFLAGS_ENVMAP = 0x4000
+RESOURCE_NO_DATA = 0x02
+RESOURCE_LOW_RES = b'\x01\0\0'
+RESOURCE_HIGH_RES = b'\x30\0\0'
+
+# Image formats: id -> (name, bytes per pixel | bytes per 4x4 block, block compressed)
+IMAGE_FORMATS = {
+    0: ('RGBA8888', 4, False), 1: ('ABGR8888', 4, False), 2: ('RGB888', 3, False),
+    3: ('BGR888', 3, False), 4: ('RGB565', 2, False), 5: ('I8', 1, False),
+    6: ('IA88', 2, False), 7: ('P8', 1, False), 8: ('A8', 1, False),
+    9: ('RGB888_BLUESCREEN', 3, False), 10: ('BGR888_BLUESCREEN', 3, False),
+    11: ('ARGB8888', 4, False), 12: ('BGRA8888', 4, False), 13: ('DXT1', 8, True),
+    14: ('DXT3', 16, True), 15: ('DXT5', 16, True), 16: ('BGRX8888', 4, False),
+    17: ('BGR565', 2, False), 18: ('BGRX5551', 2, False), 19: ('BGRA4444', 2, False),
+    20: ('DXT1_ONEBITALPHA', 8, True), 21: ('BGRA5551', 2, False), 22: ('UV88', 2, False),
+    23: ('UVWQ8888', 4, False), 24: ('RGBA16161616F', 8, False), 25: ('RGBA16161616', 8, False),
+    26: ('UVLX8888', 4, False),
+}
+
+class VTFHeader:
+    """Parsed VTF header (7.0 - 7.5)"""
+
+    def __init__(self, data):
+        if data[:4] != VTF_SIGNATURE:
+            raise ValueError("[vtf] Not a VTF file")
+        (self.major, self.minor, self.header_size, self.width, self.height, self.flags,
+         self.frames, self.first_frame) = struct.unpack_from('<3I2HI2H', data, 4)
+        self.bumpmap_scale, self.format, self.mip_count, self.low_res_format, \
+            self.low_res_width, self.low_res_height = struct.unpack_from('<fiBi2B', data, 48)
+        self.depth = struct.unpack_from('<H', data, 63)[0] if self.minor >= 2 else 1
+
+        # 7.3+: resource directory (offsets of the thumbnail, image data, CRC, LOD...)
+        self.resources = []
+        if self.minor >= 3:
+            count = struct.unpack_from('<I', data, 68)[0]
+            for i in range(count):
+                tag, flags, offset = struct.unpack_from('<3sBI', data, 80 + i * 8)
+                self.resources.append((tag, flags, offset))
+
+    @property
+    def format_name(self):
+        return IMAGE_FORMATS.get(self.format, (f"UNKNOWN({self.format})",))[0]
+
+    @property
+    def faces(self):
+        return 6 if self.flags & TEXTUREFLAGS_ENVMAP else 1
+
+    def mip_size(self, level):
+        """Bytes of one mip level across frames/faces/slices"""
+        width = max(1, self.width >> level)
+        height = max(1, self.height >> level)
+        depth = max(1, self.depth >> level)
+        return image_size(self.format, width, height) * depth * self.frames * self.faces
+
+    def high_res_size(self):
+        return sum(self.mip_size(level) for level in range(self.mip_count))
+
+    def low_res_size(self):
+        if self.low_res_format < 0 or not self.low_res_width:
+            return 0
+        return image_size(self.low_res_format, self.low_res_width, self.low_res_height)
+
+    def high_res_offset(self):
+        for tag, flags, offset in self.resources:
+            if tag == RESOURCE_HIGH_RES:
+                return offset
+        return self.header_size + self.low_res_size()
+
+    def describe(self):
+        return (f"{self.format_name} {self.width}x{self.height} {self.mip_count} mips "
+                f"(v{self.major}.{self.minor})")
+
+def image_size(image_format, width, height):
+    """Bytes of one width x height image"""
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"[vtf] Unsupported image format {image_format}")
+    _, size, block = IMAGE_FORMATS[image_format]
+    if block:
+        return max(1, (width + 3) // 4) * max(1, (height + 3) // 4) * size
+    return width * height * size
+
+def read_header(vtf_path):
+    """Header of a VTF file"""
+    with open(vtf_path, 'rb') as f:
+        return VTFHeader(f.read(4096))
+
+def levels_to_drop(header, max_size):
+    """Top mips to remove so the largest side fits max_size (keeps at least one mip)"""
+    drop = 0
+    while drop < header.mip_count - 1 and max(header.width, header.height) >> drop > max_size:
+        drop += 1
+    return drop
+
+def strip_mips(src, dst, max_size, store=None, stager=None):
+    """Copy src to dst dropping mip levels above max_size (no re-encoding). Returns (before, after) headers,
+    both None when the header was not read (no max_size) or was unreadable: those files are copied unchanged.
+    With a content store, dst is linked to the stored copy instead of written."""
+    header = None
+    if max_size:
+        data = Path(src).read_bytes()
+        try:
+            header = VTFHeader(data)
+            # Envmaps are left alone
+            drop = levels_to_drop(header, max_size) if header.faces == 1 else 0
+            if drop:
+                return header, _write_stripped(header, data, drop, dst, store, stager)
+        except (ValueError, struct.error) as e:
+            logger.warning(f"[vtf] {Path(src).name}: cannot strip mips ({e}), copying unchanged")
+
+    if store:
+        store.link(src, dst, stager)
+    else:
+        # dst may be a link to a shared file, never write through it
+        remove_file(dst)
+        shutil.copyfile(src, dst)
+    return header, header
+
+def _write_stripped(header, data, drop, dst, store, stager):
+    """Write data without its top drop mips, returns the new header"""
+    image_offset = header.high_res_offset()
+    kept_size = sum(header.mip_size(level) for level in range(drop, header.mip_count))
+    removed = header.high_res_size() - kept_size
+    # Mips are stored smallest first, the largest ones are at the end of the image block
+    image = data[image_offset:image_offset + kept_size]
+    image_end = image_offset + header.high_res_size()
+    if image_end > len(data):
+        raise ValueError(f"[vtf] Truncated image data ({len(data)} of {image_end} bytes)")
+
+    out = bytearray(data[:image_offset]) + image + data[image_end:]
+    struct.pack_into('<2H', out, 16, max(1, header.width >> drop), max(1, header.height >> drop))
+    struct.pack_into('<B', out, 56, header.mip_count - drop)
+    if header.minor >= 2:
+        struct.pack_into('<H', out, 63, max(1, header.depth >> drop))
+    # Resources stored after the image data move up
+    for i, (tag, flags, offset) in enumerate(header.resources):
+        if not flags & RESOURCE_NO_DATA and offset >= image_end:
+            struct.pack_into('<I', out, 80 + i * 8 + 4, offset - removed)
+
+    if store:
+        store.link_bytes(bytes(out), dst, stager)
+    else:
+        temp_path = Path(str(dst) + '.tmp')
+        temp_path.write_bytes(out)
+        remove_file(dst)
+        os.replace(temp_path, dst)
+    return VTFHeader(out)
+
+def copy_texture(src, dst, max_size=None, store=None, stager=None):
+    """Copy one texture (stripping mips if needed), returns a report line"""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    before, after = strip_mips(src, dst, max_size, store, stager)
+    if before is None:
+        return f"{dst.name}: copied"
+    if after is before:
+        return f"{dst.name}: {before.describe()}"
+    return f"{dst.name}: {before.describe()} -> {after.width}x{after.height} {after.mip_count} mips"
+
+def copy_textures(textures, max_size=None, workers=None, store=None, stager=None):
+    """Copy [(src, dst)] in parallel (through the content store if given), returns written paths"""
+    written = []
+
+    def job(pair):
+        src, dst = pair
+        try:
+            return dst, copy_texture(src, dst, max_size, store, stager)
+        except (OSError, ValueError, struct.error) as e:
+            return None, f"{Path(src).name}: {e}"
+
+    with ThreadPoolExecutor(max_workers=workers or min(8, (os.cpu_count() or 1) + 4)) as pool:
+        for dst, report in pool.map(job, textures):
+            logger.info(f"[vtf] {report}")
+            if dst:
+                written.append(dst)
+    return written
+
+def main():
+    """python vtf.py info <file.vtf>... | python vtf.py strip <src> <dst> -max-size N"""
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command', required=True)
+    info = sub.add_parser('info', help='Show format, size and mips')
+    info.add_argument('files', nargs='+')
+    strip = sub.add_parser('strip', help='Drop mips above a size')
+    strip.add_argument('src')
+    strip.add_argument('dst')
+    strip.add_argument('-max-size', type=int, required=True)
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        for path in args.files:
+            print(f"{path}: {read_header(path).describe()}")
+    else:
+        print(f"[vtf] {copy_texture(Path(args.src), Path(args.dst), args.max_size)}")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"[vtf] ERROR: {e}")
+        sys.exit(1)
@@ -0,0 +1,179 @@
+"""
+skin2momentum
+watcher - recursive file watching (inotify via ctypes, polling elsewhere) with debouncing
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from pathlib import Path
+from events import get_logger
+
+logger = get_logger('watcher')
+
+# linux/inotify.h
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+
+DEFAULT_DEBOUNCE = 0.5
+POLL_INTERVAL = 2.0
+
+class InotifyWatcher:
+    """Linux inotify on every directory under root"""
+
+    def __init__(self, root):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.root = Path(root)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}
+        try:
+            self.add_tree(self.root)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def add_tree(self, top):
+        """Watch top and all directories below it (ENOSPC when over max_user_watches)"""
+        for directory, dirs, _ in os.walk(top):
+            wd = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOENT:
+                    continue
+                raise OSError(error, f"inotify_add_watch failed: {directory}")
+            self.dirs[wd] = Path(directory)
+
+    def wait(self, timeout=None):
+        """Changed paths (empty set on timeout)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost, treat the whole tree as changed
+                changed.add(self.root)
+                continue
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            directory = self.dirs.get(wd)
+            if directory is None:
+                continue
+            path = directory / os.fsdecode(name) if name else directory
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self.add_tree(path)
+                # Files may have landed before the watch was added
+                changed.update(p for p in path.rglob('*') if p.is_file())
+            changed.add(path)
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+class PollingWatcher:
+    """mtime/size snapshots of root, compared every interval"""
+
+    def __init__(self, root, interval=POLL_INTERVAL):
+        self.root = Path(root)
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self):
+        snapshot = {}
+        stack = [str(self.root)]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout=None):
+        """Changed paths (empty set on timeout)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval if deadline is None else min(self.interval, max(0, deadline - time.monotonic()))
+            time.sleep(delay)
+            snapshot = self.scan()
+            changed = {Path(path) for path in snapshot.keys() ^ self.snapshot.keys()}
+            changed.update(Path(path) for path, state in snapshot.items()
+                           if path in self.snapshot and self.snapshot[path] != state)
+            self.snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+def create_watcher(root, polling=False):
+    """inotify where available, else polling"""
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"[watcher] inotify unavailable ({e}), polling every {POLL_INTERVAL:.0f}s")
+    return PollingWatcher(root)
+
+def changes(watcher, debounce=DEFAULT_DEBOUNCE):
+    """Yield sets of changed paths, merging changes that arrive within debounce seconds"""
+    while True:
+        try:
+            changed = watcher.wait()
+            while changed:
+                more = watcher.wait(debounce)
+                if not more:
+                    break
+                changed |= more
+        except OSError as e:
+            # A new directory could not be watched (ENOSPC over max_user_watches, or gone again)
+            logger.warning(f"[watcher] inotify failed ({e}), polling every {POLL_INTERVAL:.0f}s")
+            watcher.close()
+            watcher = PollingWatcher(watcher.root)
+            # Events may have been lost: treat the whole tree as changed
+            changed = {watcher.root}
+        if changed:
+            yield changed